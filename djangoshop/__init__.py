@@ -0,0 +1,15 @@
+import os
+
+
+# Django 3.1 при импорте берёт LooseVersion из distutils, а setuptools подменяет distutils своей
+# копией вместе с pkg_resources: +170 мс и +11 МБ RSS на каждый процесс. Переменная окружения
+# SETUPTOOLS_USE_DISTUTILS=stdlib действует только при старте интерпретатора, поэтому уже
+# установленный перехватчик снимаем здесь: пакет импортируется раньше Django в wsgi.py, asgi.py
+# и manage.py. Переменная наследуется дочерними процессами, там перехватчик не ставится вовсе.
+if os.environ.setdefault('SETUPTOOLS_USE_DISTUTILS', 'stdlib') == 'stdlib':
+    try:
+        import _distutils_hack
+    except ImportError:
+        pass
+    else:
+        _distutils_hack.remove_shim()
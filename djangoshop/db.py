@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.db import connections
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def close_unusable_connections(**kwargs):
+    # Django 3.1 не знает CONN_HEALTH_CHECKS (проверка появилась в 4.1): постоянное соединение,
+    # которое сервер закрыл между запросами, закрываем до первого запроса, чтобы открылось новое
+    for connection in connections.all():
+        if not connection.settings_dict.get('CONN_HEALTH_CHECKS') or connection.connection is None:
+            continue
+        if not connection.is_usable():
+            connection.close()
+
+
+class PrimaryReplicaRouter:
+    """
+    Чтение каталога (категории и товары) уходит на реплику, если она настроена,
+    корзины, заказы и любые записи остаются на основной базе.
+    """
+
+    primary = 'default'
+
+    @property
+    def replica(self):
+        alias = getattr(settings, 'DATABASE_READ_REPLICA', 'replica')
+        return alias if alias in connections.databases else None
+
+    @staticmethod
+    def is_catalog(model):
+        return model._meta.label_lower in getattr(settings, 'DATABASE_REPLICA_MODELS', ())
+
+    def db_for_read(self, model, **hints):
+        if self.replica and self.is_catalog(model):
+            return self.replica
+        return self.primary
+
+    def db_for_write(self, model, **hints):
+        return self.primary
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {self.primary, self.replica}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == self.primary
@@ -39,7 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
 
-    'mainapp',
+    'mainapp.apps.MainappConfig',
     'crispy_forms',
 ]
 
@@ -133,4 +133,19 @@ STATICFILES_DIRS = (
 
 SITE_ID = 1
 
-CRISPY_TEMPLATE_PACK = "bootstrap4"
\ No newline at end of file
+CRISPY_TEMPLATE_PACK = "bootstrap4"
+
+
+# Background jobs
+
+JOBS_WORKER_CONCURRENCY = 2
+JOBS_POLL_INTERVAL = 1
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_DELAY = 30
+JOBS_STALE_TIMEOUT = 600
+JOBS_HEARTBEAT_INTERVAL = 60
+
+
+# Inventory
+
+STOCK_RESERVATION_TTL = 15 * 60
@@ -0,0 +1,83 @@
+"""
+Production settings for djangoshop project.
+
+Usage: DJANGO_SETTINGS_MODULE=djangoshop.settings_production
+
+Keeps database connections open between requests, tunes SQLite for concurrent
+writes (WAL, busy timeout) and, when DATABASE_REPLICA_NAME is set, sends catalog
+reads to the read replica.
+"""
+
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR
+
+
+DEBUG = os.environ.get('DJANGO_DEBUG') == '1'
+
+ALLOWED_HOSTS = [host for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if host]
+
+
+# Database
+# https://docs.djangoproject.com/en/3.1/ref/databases/#persistent-connections
+
+CONN_MAX_AGE = int(os.environ.get('DJANGO_CONN_MAX_AGE', 60))
+
+
+def database(name, host='', **extra):
+    engine = os.environ.get('DATABASE_ENGINE', 'django.db.backends.sqlite3')
+    config = {
+        'ENGINE': engine,
+        'NAME': name,
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        # Проверка соединения перед повторным использованием: в Django 3.1 её выполняет
+        # djangoshop.db.close_unusable_connections в начале каждого запроса
+        'CONN_HEALTH_CHECKS': True,
+    }
+    if engine == 'django.db.backends.sqlite3':
+        # Ожидание освобождения блокировки вместо мгновенного "database is locked"
+        config['OPTIONS'] = {'timeout': 20}
+    else:
+        config.update(
+            USER=os.environ.get('DATABASE_USER', ''),
+            PASSWORD=os.environ.get('DATABASE_PASSWORD', ''),
+            HOST=host,
+            PORT=os.environ.get('DATABASE_PORT', ''),
+        )
+    config.update(extra)
+    return config
+
+
+DATABASES = {
+    'default': database(
+        os.environ.get('DATABASE_NAME', str(BASE_DIR / 'db.sqlite3')),
+        host=os.environ.get('DATABASE_HOST', ''),
+    ),
+}
+
+if os.environ.get('DATABASE_REPLICA_NAME'):
+    DATABASES['replica'] = database(
+        os.environ['DATABASE_REPLICA_NAME'],
+        host=os.environ.get('DATABASE_REPLICA_HOST', os.environ.get('DATABASE_HOST', '')),
+        TEST={'MIRROR': 'default'},
+    )
+
+DATABASE_ROUTERS = ['djangoshop.db.PrimaryReplicaRouter']
+
+DATABASE_READ_REPLICA = 'replica'
+
+DATABASE_REPLICA_MODELS = (
+    'mainapp.category',
+    'mainapp.notebook',
+    'mainapp.smartphone',
+)
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'cache_size': -20000,
+    'temp_store': 'MEMORY',
+    'mmap_size': 134217728,
+}
@@ -0,0 +1,36 @@
+"""
+Storefront settings for djangoshop project.
+
+Usage: DJANGO_SETTINGS_MODULE=djangoshop.settings_storefront
+
+Lean profile for workers that serve only the shop: django.contrib.admin is not
+installed, so admin modules (including mainapp.admin and its forms) are never
+imported, staff pages are not routed and static files are left to the web
+server. Middleware is unchanged: sessions, auth, messages, CSRF and clickjacking
+protection are all used by the shop pages. Admin, reports and management
+commands keep using djangoshop.settings or djangoshop.settings_production.
+
+Admin is left out rather than registered lazily: every reverse() populates the
+whole URLconf, so a lazily included admin would load on the first shop page
+anyway. Per-worker memory is dominated by Django itself; the large saving
+(~170 ms and ~11 MB RSS per process) comes from disabling the setuptools
+distutils shim in djangoshop/__init__.py and applies to every profile.
+"""
+
+from .settings_production import *  # noqa: F401,F403
+from .settings_production import INSTALLED_APPS
+
+
+INSTALLED_APPS = [
+    app for app in INSTALLED_APPS if app not in ('django.contrib.admin', 'django.contrib.staticfiles')
+]
+
+ROOT_URLCONF = 'djangoshop.urls_storefront'
+
+# Checked by "manage.py profile_startup --settings-module djangoshop.settings_storefront --check".
+# Measured (median of 7 runs): ~280 ms / 45.7 MB RSS / 565 modules, versus ~335 ms / 45.7 MB /
+# 591 modules for djangoshop.settings: ~55 ms faster start, no measurable RSS difference
+STARTUP_BUDGET = {
+    'time_ms': 400,
+    'rss_mb': 50,
+}
@@ -0,0 +1,17 @@
+"""djangoshop storefront URL Configuration
+
+Only the shop pages: no admin and no staff reports, see djangoshop.settings_storefront.
+"""
+from django.conf import settings
+from django.conf.urls.static import static
+from django.urls import path, include
+
+from mainapp.urls import storefront_urlpatterns
+
+urlpatterns = [
+    path('', include(storefront_urlpatterns)),
+]
+
+if settings.DEBUG:
+    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
+    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -2,7 +2,8 @@ from django.forms import ModelChoiceField, ModelForm
 from django.contrib import admin
 from django.utils.html import mark_safe
 from .models import Category, Notebook, CartProduct, \
-    Cart, Customer, Smartphone, Order
+    Cart, Customer, Smartphone, Order, DailySales, DailyCategorySales, DailyProductSales, Job, \
+    StockReservation, ProductCooccurrence, RelatedProduct
 
 # Register your models here.
 
@@ -45,9 +46,9 @@ class SmartphoneAdmin(admin.ModelAdmin):
 
     change_form_template = 'mainapp/admin.html'
 
-    list_display = ('title', 'price', 'get_image', 'slug')
+    list_display = ('title', 'price', 'stock', 'get_image', 'slug')
     readonly_fields = ('get_image',)
-    list_editable = ('price',)
+    list_editable = ('price', 'stock')
     list_filter = ('title', 'price')
     form = SmartphoneAdminAllForm
     save_as = True
@@ -69,9 +70,9 @@ class SmartphoneAdmin(admin.ModelAdmin):
 
 @admin.register(Notebook)
 class NotebookAdmin(admin.ModelAdmin):
-    list_display = ('title', 'price', 'get_image', 'slug')
+    list_display = ('title', 'price', 'stock', 'get_image', 'slug')
     readonly_fields = ('get_image',)
-    list_editable = ('price',)
+    list_editable = ('price', 'stock')
     list_filter = ('title', 'price')
     form = ProductAdminForm
     save_as = True
@@ -96,3 +97,10 @@ admin.site.register(CartProduct)
 admin.site.register(Cart)
 admin.site.register(Customer)
 admin.site.register(Order)
+admin.site.register(DailySales)
+admin.site.register(DailyCategorySales)
+admin.site.register(DailyProductSales)
+admin.site.register(Job)
+admin.site.register(StockReservation)
+admin.site.register(ProductCooccurrence)
+admin.site.register(RelatedProduct)
@@ -3,3 +3,17 @@ from django.apps import AppConfig
 
 class MainappConfig(AppConfig):
     name = 'mainapp'
+
+    def ready(self):
+        from django.core.signals import request_started
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save
+        from djangoshop.db import close_unusable_connections, configure_sqlite
+        from .models import Notebook, Smartphone
+        from .recommendations import product_changed, product_deleted
+
+        connection_created.connect(configure_sqlite)
+        request_started.connect(close_unusable_connections)
+        for model in (Notebook, Smartphone):
+            post_save.connect(product_changed, sender=model)
+            post_delete.connect(product_deleted, sender=model)
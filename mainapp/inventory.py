@@ -0,0 +1,146 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import models, transaction
+from django.utils import timezone
+
+from .models import StockReservation
+
+
+class OutOfStock(Exception):
+
+    def __init__(self, products):
+        self.products = products
+        super().__init__(', '.join(product.title for product in products))
+
+
+def get_reservation_ttl():
+    return timedelta(seconds=getattr(settings, 'STOCK_RESERVATION_TTL', 15 * 60))
+
+
+def quantity_case(quantities):
+    return models.Case(
+        *[models.When(pk=pk, then=models.Value(quantity)) for pk, quantity in quantities.items()],
+        output_field=models.PositiveIntegerField()
+    )
+
+
+def group_by_model(items):
+    grouped = defaultdict(dict)
+    for content_type_id, object_id, quantity in items:
+        grouped[content_type_id][object_id] = grouped[content_type_id].get(object_id, 0) + quantity
+    return sorted(grouped.items())
+
+
+def get_cart_items(cart):
+    return cart.products.values_list('content_type_id', 'object_id', 'quantity')
+
+
+def get_available_stock(cart, product):
+    # Из product.stock уже вычтен резерв этой же корзины, при проверке своей корзины его нужно вернуть
+    if cart.for_anonymous_user:
+        return product.stock
+    reserved = cart.reservations.filter(
+        content_type=ContentType.objects.get_for_model(product), object_id=product.pk, expires_at__isnull=False
+    ).aggregate(quantity=models.Sum('quantity'))['quantity']
+    return product.stock + (reserved or 0)
+
+
+def decrement_stock(items):
+    # Один условный UPDATE ... WHERE stock >= qty на модель, недостаток товара виден по числу
+    # обновлённых строк. Строки товаров остаются заблокированными до конца транзакции, поэтому
+    # вызывающий код списывает остаток отдельной короткой транзакцией, а не внутри транзакции заказа
+    for content_type_id, quantities in group_by_model(items):
+        manager = ContentType.objects.get_for_id(content_type_id).model_class()._base_manager
+        case = quantity_case(quantities)
+        updated = manager.filter(pk__in=quantities, stock__gte=case).update(stock=models.F('stock') - case)
+        if updated != len(quantities):
+            return content_type_id, quantities
+    return None
+
+
+def increment_stock(items):
+    for content_type_id, quantities in group_by_model(items):
+        manager = ContentType.objects.get_for_id(content_type_id).model_class()._base_manager
+        manager.filter(pk__in=quantities).update(stock=models.F('stock') + quantity_case(quantities))
+
+
+def release_reservations(reservations):
+    released = []
+    for reservation in reservations:
+        # Резерв мог уже вернуть на склад параллельный процесс, поэтому возвращаем только удалённые нами
+        if StockReservation.objects.filter(pk=reservation.pk, expires_at__isnull=False).delete()[0]:
+            released.append((reservation.content_type_id, reservation.object_id, reservation.quantity))
+    increment_stock(released)
+    return len(released)
+
+
+class ReservationChanged(Exception):
+    pass
+
+
+def reserve_cart(cart):
+    items = list(get_cart_items(cart))
+    try:
+        with transaction.atomic():
+            release_reservations(cart.reservations.filter(expires_at__isnull=False))
+            shortage = decrement_stock(items)
+            if shortage is not None:
+                raise ReservationChanged
+            expires_at = timezone.now() + get_reservation_ttl()
+            StockReservation.objects.bulk_create([
+                StockReservation(
+                    cart=cart, content_type_id=content_type_id, object_id=object_id,
+                    quantity=quantity, expires_at=expires_at
+                )
+                for content_type_id, object_id, quantity in items
+            ])
+    except ReservationChanged:
+        content_type_id, quantities = shortage
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        raise OutOfStock([
+            product for product in model._base_manager.filter(pk__in=quantities)
+            if product.stock < quantities[product.pk]
+        ])
+
+
+def confirm_cart(cart):
+    try:
+        with transaction.atomic():
+            reservations = cart.reservations.filter(expires_at__gte=timezone.now())
+            reserved = list(reservations.values_list('content_type_id', 'object_id', 'quantity'))
+            if group_by_model(reserved) != group_by_model(get_cart_items(cart)):
+                raise ReservationChanged
+            # Резерв, истёкший между проверкой и подтверждением, уже мог вернуться на склад
+            if reservations.update(expires_at=None) != len(reserved):
+                raise ReservationChanged
+            return
+    except ReservationChanged:
+        pass
+    with transaction.atomic():
+        reserve_cart(cart)
+        cart.reservations.filter(expires_at__isnull=False).update(expires_at=None)
+
+
+def release_cart(cart):
+    # Состав корзины изменился: резерв, сделанный при переходе к оформлению, больше ей не соответствует
+    if cart.for_anonymous_user:
+        return 0
+    with transaction.atomic():
+        return release_reservations(cart.reservations.filter(expires_at__isnull=False))
+
+
+def cancel_cart(cart):
+    # Компенсация, если заказ не удалось сохранить после того, как confirm_cart списал остаток
+    with transaction.atomic():
+        reservations = cart.reservations.filter(expires_at__isnull=True)
+        items = list(reservations.values_list('content_type_id', 'object_id', 'quantity'))
+        reservations.delete()
+        increment_stock(items)
+
+
+def release_expired_reservations():
+    with transaction.atomic():
+        return release_reservations(StockReservation.objects.filter(expires_at__lt=timezone.now()))
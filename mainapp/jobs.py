@@ -0,0 +1,139 @@
+import logging
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+REGISTRY = {}
+
+
+def get_setting(name, default):
+    return getattr(settings, name, default)
+
+
+def job(name):
+    def decorator(func):
+        REGISTRY[name] = func
+        return func
+    return decorator
+
+
+def autodiscover():
+    autodiscover_modules('tasks')
+
+
+def enqueue(name, max_attempts=None, **payload):
+    # Задача попадает в очередь только после фиксации транзакции запроса:
+    # обработчик не увидит заказ, которого ещё нет, а откат не оставит лишних задач
+    def create():
+        Job.objects.create(
+            name=name, payload=payload,
+            max_attempts=max_attempts or get_setting('JOBS_MAX_ATTEMPTS', 5)
+        )
+    transaction.on_commit(create)
+
+
+def claim_jobs(worker, limit):
+    now = timezone.now()
+    candidates = Job.objects.filter(status=Job.STATUS_QUEUED, run_at__lte=now)\
+        .order_by('run_at', 'id').values_list('id', flat=True)[:limit]
+    claimed = []
+    for job_id in candidates:
+        updated = Job.objects.filter(id=job_id, status=Job.STATUS_QUEUED).update(
+            status=Job.STATUS_RUNNING, locked_by=worker, locked_at=now, attempts=F('attempts') + 1
+        )
+        if updated:
+            claimed.append(job_id)
+    return list(Job.objects.filter(id__in=claimed).order_by('run_at', 'id'))
+
+
+class Heartbeat(threading.Thread):
+
+    def __init__(self, job, interval):
+        super().__init__(name=f'heartbeat-{job.id}', daemon=True)
+        self.job = job
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                self.beat()
+        finally:
+            connection.close()
+
+    def beat(self):
+        # Задачу, которую уже вернули в очередь как зависшую, больше не продлеваем
+        return Job.objects.filter(id=self.job.id, status=Job.STATUS_RUNNING, locked_by=self.job.locked_by)\
+            .update(locked_at=timezone.now())
+
+
+@contextmanager
+def heartbeat(job):
+    # Пока задача выполняется, locked_at обновляется, и requeue_stale_jobs не отдаёт её второму обработчику
+    thread = Heartbeat(job, get_setting('JOBS_HEARTBEAT_INTERVAL', 60))
+    thread.start()
+    try:
+        yield thread
+    finally:
+        thread.stopped.set()
+        thread.join()
+
+
+def run_job(job):
+    func = REGISTRY.get(job.name)
+    try:
+        if func is None:
+            raise LookupError(f'Задача {job.name!r} не зарегистрирована')
+        with heartbeat(job):
+            func(**job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if func is None or job.attempts >= job.max_attempts:
+            job.status = Job.STATUS_FAILED
+            job.finished_at = timezone.now()
+            logger.error('Job %s failed permanently', job, exc_info=True)
+        else:
+            delay = get_setting('JOBS_RETRY_DELAY', 30) * 2 ** (job.attempts - 1)
+            job.status = Job.STATUS_QUEUED
+            job.run_at = timezone.now() + timedelta(seconds=delay)
+            logger.warning('Job %s failed, retry in %s s', job, delay, exc_info=True)
+    else:
+        job.status = Job.STATUS_DONE
+        job.last_error = None
+        job.finished_at = timezone.now()
+    job.locked_by = None
+    job.locked_at = None
+    job.save(update_fields=['status', 'run_at', 'last_error', 'locked_by', 'locked_at', 'finished_at'])
+    return job.status
+
+
+def requeue_stale_jobs(timeout=None):
+    timeout = timeout or get_setting('JOBS_STALE_TIMEOUT', 600)
+    now = timezone.now()
+    stale = Job.objects.filter(status=Job.STATUS_RUNNING, locked_at__lt=now - timedelta(seconds=timeout))
+    # Обработчик, не переживший задачу, тоже тратит попытку: иначе падающая задача крутилась бы вечно
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.STATUS_FAILED, locked_by=None, locked_at=None, finished_at=now,
+        last_error='Обработчик не завершил задачу за отведённое время'
+    )
+    if failed:
+        logger.error('%s stale jobs failed permanently', failed)
+    return failed + stale.update(status=Job.STATUS_QUEUED, locked_by=None, locked_at=None)
+
+
+def run_pending(worker='local', limit=100):
+    jobs = claim_jobs(worker, limit)
+    for claimed in jobs:
+        run_job(claimed)
+    return len(jobs)
@@ -0,0 +1,154 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from mainapp.models import CartProduct, RollupWatermark, ProductCooccurrence, RelatedProduct
+from mainapp.recommendations import refresh_related_products
+
+
+class Command(BaseCommand):
+
+    help = 'Инкрементальный пересчёт рекомендаций "с этим товаром покупают" по совместным покупкам в корзинах'
+
+    WATERMARK = 'recommendations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--top-k', type=int, default=6)
+        parser.add_argument(
+            '--lag', type=int, default=60,
+            help='Не обрабатывать товары, добавленные в корзину позже указанного числа секунд назад, '
+                 'чтобы не пропустить незавершённые транзакции'
+        )
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Сверить с товарами все сохранённые карточки рекомендаций, в том числе изменённые в обход save()'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=options['lag'])
+        processed = 0
+        refreshed = set()
+        while True:
+            with transaction.atomic():
+                watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=self.WATERMARK)
+                new_items = list(
+                    CartProduct.objects.filter(id__gt=watermark.last_id).order_by('id')
+                    .values_list('id', 'cart_id', 'content_type_id', 'object_id', 'cart__for_anonymous_user',
+                                 'created_at')
+                    [:options['batch_size']]
+                )
+                ready = []
+                for item in new_items:
+                    if item[5] > cutoff:
+                        break
+                    ready.append(item[:5])
+                if not ready:
+                    break
+                touched = self.count_pairs(ready)
+                self.refresh_related(touched, options['top_k'])
+                watermark.last_id = ready[-1][0]
+                watermark.save()
+            processed += len(ready)
+            refreshed |= touched
+            if len(ready) < len(new_items):
+                break
+        message = f'Обработано товаров в корзинах: {processed}, обновлены рекомендации для {len(refreshed)} товаров'
+        if options['full']:
+            # Обычно карточки обновляются при сохранении товара и при импорте, полная сверка
+            # нужна после изменений в обход save(), например QuerySet.update()
+            stale = sum(
+                refresh_related_products(ContentType.objects.get_for_id(content_type_id).model_class())
+                for content_type_id in
+                RelatedProduct.objects.values_list('related_content_type_id', flat=True).distinct()
+            )
+            message += f', обновлено устаревших карточек: {stale}'
+        self.stdout.write(self.style.SUCCESS(message))
+
+    def count_pairs(self, new_items):
+        # Общая корзина анонимных пользователей смешивает покупки разных людей, её не учитываем
+        new_items = [item for item in new_items if not item[4]]
+        cart_items = defaultdict(list)
+        for item_id, cart_id, content_type_id, object_id in CartProduct.objects.filter(
+                cart_id__in={item[1] for item in new_items}).values_list('id', 'cart_id', 'content_type_id', 'object_id'):
+            cart_items[cart_id].append((item_id, (content_type_id, object_id)))
+
+        # Пара учитывается один раз, когда в корзину попадает второй из двух товаров
+        pairs = Counter()
+        for item_id, cart_id, content_type_id, object_id, _ in new_items:
+            product = (content_type_id, object_id)
+            for other_id, other in cart_items[cart_id]:
+                if other_id < item_id and other != product:
+                    pairs[product, other] += 1
+                    pairs[other, product] += 1
+        if not pairs:
+            return set()
+
+        existing = {}
+        for content_type_id, ids in group_by_content_type(product for product, _ in pairs).items():
+            for row in ProductCooccurrence.objects.filter(content_type_id=content_type_id, object_id__in=ids):
+                key = (row.content_type_id, row.object_id), (row.related_content_type_id, row.related_object_id)
+                existing[key] = row
+        to_create, to_update = [], []
+        for (product, other), count in pairs.items():
+            row = existing.get((product, other))
+            if row is None:
+                to_create.append(ProductCooccurrence(
+                    content_type_id=product[0], object_id=product[1],
+                    related_content_type_id=other[0], related_object_id=other[1], count=count
+                ))
+            else:
+                row.count += count
+                to_update.append(row)
+        ProductCooccurrence.objects.bulk_create(to_create)
+        ProductCooccurrence.objects.bulk_update(to_update, ['count'])
+        return {product for product, _ in pairs}
+
+    def refresh_related(self, products, top_k):
+        if not products:
+            return
+        top = {}
+        related_ids = defaultdict(set)
+        for content_type_id, object_id in products:
+            rows = list(
+                ProductCooccurrence.objects.filter(content_type_id=content_type_id, object_id=object_id)
+                .order_by('-count', 'related_content_type_id', 'related_object_id')
+                .values_list('related_content_type_id', 'related_object_id', 'count')[:top_k]
+            )
+            top[content_type_id, object_id] = rows
+            for related_content_type_id, related_object_id, _ in rows:
+                related_ids[related_content_type_id].add(related_object_id)
+
+        details = {}
+        for content_type_id, ids in related_ids.items():
+            model = ContentType.objects.get_for_id(content_type_id).model_class()
+            for pk, title, slug, price, image in model._base_manager.filter(id__in=ids).values_list(
+                    'id', 'title', 'slug', 'price', 'image'):
+                details[content_type_id, pk] = dict(title=title, slug=slug, price=price, image=image)
+
+        for content_type_id, ids in group_by_content_type(products).items():
+            RelatedProduct.objects.filter(content_type_id=content_type_id, object_id__in=ids).delete()
+        to_create = []
+        for (content_type_id, object_id), rows in top.items():
+            rank = 0
+            for related_content_type_id, related_object_id, count in rows:
+                if (related_content_type_id, related_object_id) not in details:
+                    continue
+                rank += 1
+                to_create.append(RelatedProduct(
+                    content_type_id=content_type_id, object_id=object_id, rank=rank,
+                    related_content_type_id=related_content_type_id, related_object_id=related_object_id,
+                    score=count, **details[related_content_type_id, related_object_id]
+                ))
+        RelatedProduct.objects.bulk_create(to_create)
+
+
+def group_by_content_type(products):
+    grouped = defaultdict(set)
+    for content_type_id, object_id in products:
+        grouped[content_type_id].add(object_id)
+    return grouped
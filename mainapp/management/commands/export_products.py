@@ -0,0 +1,63 @@
+import csv
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mainapp.management.products_io import PRODUCT_MODELS, FORMATS, get_product_fields, \
+    get_export_columns, guess_format
+
+
+class Command(BaseCommand):
+
+    help = 'Потоковая выгрузка товаров в CSV или JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', required=True, choices=sorted(PRODUCT_MODELS))
+        parser.add_argument('--output', '-o', default='-', help="Путь к файлу, '-' для stdout")
+        parser.add_argument('--format', choices=FORMATS)
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size должен быть больше нуля')
+        model = PRODUCT_MODELS[options['model']]
+        path = options['output']
+        fmt = options['format'] or guess_format(path)
+        if path == '-':
+            count, elapsed = self.export(model, sys.stdout, fmt, options['chunk_size'])
+        else:
+            try:
+                stream = open(path, 'w', newline='', encoding='utf-8')
+            except OSError as e:
+                raise CommandError(e)
+            with stream:
+                count, elapsed = self.export(model, stream, fmt, options['chunk_size'])
+        self.stderr.write(f'Выгружено {count} строк ({count / max(elapsed, 1e-6):.0f} строк/с)')
+
+    def export(self, model, stream, fmt, chunk_size):
+        started = time.monotonic()
+        fields = get_product_fields(model)
+        columns = get_export_columns(model)
+        products = model._base_manager.select_related('category').order_by('pk').iterator(chunk_size=chunk_size)
+        if fmt == 'csv':
+            writer = csv.writer(stream)
+            writer.writerow(columns)
+        count = 0
+        for product in products:
+            row = [self.get_value(product, field) for field in fields]
+            if fmt == 'csv':
+                writer.writerow(row)
+            else:
+                stream.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=str) + '\n')
+            count += 1
+        return count, time.monotonic() - started
+
+    @staticmethod
+    def get_value(product, field):
+        if field.name == 'category':
+            return product.category.slug
+        if field.name == 'image':
+            return product.image.name
+        return field.value_from_object(product)
@@ -0,0 +1,234 @@
+import os
+import sys
+import time
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router, transaction
+from django.db.models import Sum
+
+from mainapp.models import Category, StockReservation
+from mainapp.recommendations import refresh_related_products
+from mainapp.management.products_io import PRODUCT_MODELS, FORMATS, get_product_fields, \
+    guess_format, read_rows, normalize_image_path
+
+
+class Command(BaseCommand):
+
+    help = 'Импорт товаров из CSV или JSONL с обновлением существующих по slug'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Путь к файлу, '-' для stdin")
+        parser.add_argument('--model', required=True, choices=sorted(PRODUCT_MODELS))
+        parser.add_argument('--format', choices=FORMATS)
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--check-images', action='store_true',
+                            help='Пропускать строки, изображение которых отсутствует в MEDIA_ROOT')
+        parser.add_argument('--dry-run', action='store_true', help='Только проверить строки, ничего не записывая')
+        parser.add_argument('--update-stock', action='store_true',
+                            help='Обновлять остаток существующих товаров за вычетом действующих резервов корзин')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size должен быть больше нуля')
+        self.model = PRODUCT_MODELS[options['model']]
+        # Сверяем slug с основной базой: реплика может отставать, и тогда строка была бы создана повторно
+        self.manager = self.model._base_manager.db_manager(router.db_for_write(self.model))
+        self.fields = get_product_fields(self.model)
+        # Остаток уменьшают резервы корзин, поэтому выгрузка каталога не должна его перезаписывать
+        self.update_stock = options['update_stock']
+        self.update_fields = [
+            field for field in self.fields
+            if field.name != 'slug' and (field.name != 'stock' or self.update_stock)
+        ]
+        self.categories = {c.slug: c for c in Category.objects.all()}
+        self.check_images = options['check_images']
+        self.dry_run = options['dry_run']
+        self.chunk_size = options['chunk_size']
+        self.verbosity = options['verbosity']
+        self.stats = dict(processed=0, created=0, updated=0, unchanged=0, skipped=0)
+
+        path = options['path']
+        fmt = options['format'] or guess_format(path)
+        if path == '-':
+            self.run(sys.stdin, fmt)
+        else:
+            try:
+                stream = open(path, newline='', encoding='utf-8')
+            except OSError as e:
+                raise CommandError(e)
+            with stream:
+                self.run(stream, fmt)
+
+    def run(self, stream, fmt):
+        started = time.monotonic()
+        rows = read_rows(stream, fmt)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            self.process_chunk(chunk)
+            if self.verbosity > 1:
+                self.report(started)
+        self.report(started, final=True)
+
+    def process_chunk(self, chunk):
+        by_slug = {}
+        for line_no, row in chunk:
+            self.stats['processed'] += 1
+            if not isinstance(row, dict):
+                self.skip(line_no, f'некорректная строка: {row}')
+                continue
+            slug = row.get('slug')
+            by_slug[slug.strip() if isinstance(slug, str) else slug] = (line_no, row)
+        existing = {
+            product.slug: product for product in self.manager.filter(slug__in=[slug for slug in by_slug if slug])
+        }
+        built = []
+        for slug, (line_no, row) in by_slug.items():
+            try:
+                built.append((existing.get(slug), *self.build_instance(row, existing.get(slug))))
+            except ValidationError as e:
+                self.skip(line_no, self.format_errors(e))
+        if self.update_stock:
+            self.subtract_reservations([
+                instance for current, instance, provided in built if current is not None and 'stock' in provided
+            ])
+        to_create, to_update = [], []
+        for current, instance, provided in built:
+            if current is None:
+                to_create.append(instance)
+                continue
+            changed = tuple(
+                field for field in self.update_fields
+                if field.name in provided and getattr(instance, field.attname) != getattr(current, field.attname)
+            )
+            # Неизменённые строки не трогаем: повторная синхронизация каталога почти не пишет в БД
+            if not changed:
+                self.stats['unchanged'] += 1
+                continue
+            to_update.append((instance, changed))
+        if not self.dry_run:
+            with transaction.atomic():
+                self.manager.bulk_create(to_create)
+                self.bulk_update(to_update)
+        self.stats['created'] += len(to_create)
+        self.stats['updated'] += len(to_update)
+
+    def bulk_update(self, updates):
+        # QuerySet.bulk_update() собирает CASE WHEN на каждое поле каждой строки и на больших
+        # объёмах упирается в построение выражений ORM, поэтому обновляем executemany по набору колонок
+        if not updates:
+            return
+        connection = connections[self.manager.db]
+        quote = connection.ops.quote_name
+        by_fields = defaultdict(list)
+        for instance, fields in updates:
+            by_fields[fields].append(instance)
+        for fields, instances in by_fields.items():
+            sql = 'UPDATE {} SET {} WHERE {} = %s'.format(
+                quote(self.model._meta.db_table),
+                ', '.join(f'{quote(field.column)} = %s' for field in fields),
+                quote(self.model._meta.pk.column),
+            )
+            params = [
+                [field.get_db_prep_save(field.pre_save(instance, False), connection) for field in fields]
+                + [instance.pk]
+                for instance in instances
+            ]
+            with connection.cursor() as cursor:
+                cursor.executemany(sql, params)
+        # executemany не вызывает post_save, поэтому копии карточек в рекомендациях обновляем сами
+        refresh_related_products(self.model, ids=[instance.pk for instance, fields in updates])
+
+    def subtract_reservations(self, instances):
+        # В файле остаток склада, а в БД из него уже вычтены действующие резервы корзин
+        if not instances:
+            return
+        reserved = dict(
+            StockReservation.objects.using(self.manager.db).filter(
+                content_type=ContentType.objects.get_for_model(self.model),
+                object_id__in=[instance.pk for instance in instances], expires_at__isnull=False,
+            ).values_list('object_id').annotate(quantity=Sum('quantity'))
+        )
+        for instance in instances:
+            instance.stock = max(instance.stock - reserved.get(instance.pk, 0), 0)
+
+    def build_instance(self, row, current=None):
+        # Существующий товар обновляется только колонками со значением: пустые и отсутствующие
+        # в файле поля сохраняют текущие значения, а у нового товара получают значения по умолчанию
+        if current is None:
+            instance = self.model()
+        else:
+            instance = self.model(pk=current.pk, **{
+                field.attname: field.value_from_object(current) for field in self.fields
+            })
+        provided = set()
+        for field in self.fields:
+            raw = row.get(field.name)
+            if isinstance(raw, str):
+                raw = raw.strip()
+            if raw in (None, ''):
+                if current is not None:
+                    continue
+                if field.name == 'category':
+                    raise ValidationError('не указана категория')
+                if field.name == 'image':
+                    raise ValidationError('не указано изображение')
+                if field.has_default():
+                    value = field.get_default()
+                elif field.null:
+                    value = None
+                else:
+                    value = ''
+                setattr(instance, field.attname, value)
+                continue
+            provided.add(field.name)
+            if field.name == 'category':
+                category = self.categories.get(raw)
+                if category is None:
+                    raise ValidationError(f'неизвестная категория {raw!r}')
+                instance.category = category
+            elif field.name == 'image':
+                image = normalize_image_path(raw)
+                if not image:
+                    raise ValidationError('не указано изображение')
+                if self.check_images and not os.path.isfile(os.path.join(settings.MEDIA_ROOT, image)):
+                    raise ValidationError(f'файл изображения {image!r} не найден')
+                instance.image = image
+            else:
+                setattr(instance, field.attname, raw)
+        exclude = ['category']
+        if current is not None:
+            exclude += [field.name for field in self.fields if field.name not in provided]
+        instance.full_clean(exclude=exclude, validate_unique=False)
+        return instance, provided
+
+    @staticmethod
+    def format_errors(error):
+        if not hasattr(error, 'error_dict'):
+            return '; '.join(error.messages)
+        return '; '.join(
+            f'{field}: {" ".join(messages)}' for field, messages in error.message_dict.items()
+        )
+
+    def skip(self, line_no, reason):
+        self.stats['skipped'] += 1
+        self.stderr.write(f'Строка {line_no}: {reason}')
+
+    def report(self, started, final=False):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        rate = self.stats['processed'] / elapsed
+        message = (
+            'Обработано {processed}, создано {created}, обновлено {updated}, без изменений {unchanged}, '
+            'пропущено {skipped}'
+            .format(**self.stats) + f' ({rate:.0f} строк/с)'
+        )
+        if final:
+            self.stdout.write(self.style.SUCCESS(message))
+        else:
+            self.stdout.write(message)
@@ -0,0 +1,124 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Запускается в отдельном процессе, чтобы замер не зависел от уже загруженных модулей manage.py.
+# Процесс стартует так же, как рабочий: с импорта модуля WSGI_APPLICATION
+STARTUP_SCRIPT = '''
+import importlib, json, resource, sys, time
+started = time.perf_counter()
+if {trace_memory}:
+    import tracemalloc
+    tracemalloc.start(10)
+importlib.import_module({wsgi_module!r})
+from django.urls import get_resolver
+get_resolver().url_patterns
+from django.conf import settings
+result = {{
+    'time_ms': (time.perf_counter() - started) * 1000,
+    'budget': getattr(settings, 'STARTUP_BUDGET', {{}}),
+    'rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'modules': len(sys.modules),
+}}
+if {trace_memory}:
+    files = {{}}
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, '__file__', None)
+        if path:
+            files[path] = name.split('.')[0]
+    memory = {{}}
+    for stat in tracemalloc.take_snapshot().statistics('traceback'):
+        # Память относим к ближайшему к месту выделения модулю, пропуская механизм импорта
+        package = next(
+            (files[frame.filename] for frame in reversed(stat.traceback) if frame.filename in files),
+            '<other>'
+        )
+        memory[package] = memory.get(package, 0) + stat.size
+    result['memory'] = memory
+print(json.dumps(result))
+'''
+
+
+class Command(BaseCommand):
+
+    help = 'Замер времени запуска процесса и потребления памяти с разбивкой по пакетам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--settings-module', default=os.environ.get('DJANGO_SETTINGS_MODULE'))
+        parser.add_argument('--top', type=int, default=15)
+        parser.add_argument('--repeat', type=int, default=3, help='Число запусков для замера времени и RSS')
+        parser.add_argument('--check', action='store_true',
+                            help='Завершиться с ошибкой, если превышен STARTUP_BUDGET профиля настроек')
+        parser.add_argument('--budget-ms', type=float)
+        parser.add_argument('--budget-rss-mb', type=float)
+
+    def handle(self, *args, **options):
+        settings_module = options['settings_module']
+        # Время и RSS меряем в отдельных запусках без -X importtime и tracemalloc: оба заметно
+        # замедляют импорт, и бюджет проверялся бы вместе с накладными расходами профилировщика
+        runs = [self.run_child(settings_module)[0] for _ in range(max(options['repeat'], 1))]
+        timing = sorted(runs, key=lambda run: run['time_ms'])[len(runs) // 2]
+        _, import_times = self.run_child(settings_module, import_time=True)
+        memory, _ = self.run_child(settings_module, trace_memory=True)
+        top = options['top']
+
+        self.stdout.write(f'Профиль настроек: {settings_module}')
+        self.stdout.write(
+            f"Время запуска: {timing['time_ms']:.0f} мс (медиана {len(runs)} запусков), "
+            f"RSS: {timing['rss_kb'] / 1024:.1f} МБ, модулей: {timing['modules']}"
+        )
+        self.stdout.write('\nИмпорт по пакетам (-X importtime, с накладными расходами), мс:')
+        by_package = defaultdict(int)
+        for module, self_us in import_times:
+            by_package[module.split('.')[0]] += self_us
+        for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:top]:
+            self.stdout.write(f'  {self_us / 1000:8.1f}  {package}')
+        self.stdout.write('\nПамять по пакетам (tracemalloc), МБ:')
+        for package, size in sorted(memory['memory'].items(), key=lambda item: -item[1])[:top]:
+            self.stdout.write(f'  {size / 2 ** 20:8.2f}  {package}')
+
+        if options['check'] or options['budget_ms'] or options['budget_rss_mb']:
+            self.check_budget(settings_module, timing, options)
+
+    def run_child(self, settings_module, import_time=False, trace_memory=False):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module)
+        wsgi_module = settings.WSGI_APPLICATION.rsplit('.', 1)[0]
+        command = [sys.executable, '-c', STARTUP_SCRIPT.format(trace_memory=trace_memory, wsgi_module=wsgi_module)]
+        if import_time:
+            command[1:1] = ['-X', 'importtime']
+        process = subprocess.run(
+            command, env=env, cwd=str(settings.BASE_DIR), capture_output=True, text=True
+        )
+        if process.returncode:
+            raise CommandError(process.stderr.strip().splitlines()[-1])
+        import_times = []
+        for line in process.stderr.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            self_us, _, module = line[len('import time:'):].split('|')
+            import_times.append((module.strip(), int(self_us)))
+        return json.loads(process.stdout.strip().splitlines()[-1]), import_times
+
+    def check_budget(self, settings_module, timing, options):
+        budget = dict(timing['budget']) if options['check'] else {}
+        if options['budget_ms']:
+            budget['time_ms'] = options['budget_ms']
+        if options['budget_rss_mb']:
+            budget['rss_mb'] = options['budget_rss_mb']
+        if not budget:
+            raise CommandError(f'В {settings_module} не задан STARTUP_BUDGET')
+        rss_mb = timing['rss_kb'] / 1024
+        errors = []
+        if 'time_ms' in budget and timing['time_ms'] > budget['time_ms']:
+            errors.append(f"время запуска {timing['time_ms']:.0f} мс > {budget['time_ms']} мс")
+        if 'rss_mb' in budget and rss_mb > budget['rss_mb']:
+            errors.append(f"RSS {rss_mb:.1f} МБ > {budget['rss_mb']} МБ")
+        if errors:
+            raise CommandError('Бюджет запуска превышен: ' + ', '.join(errors))
+        self.stdout.write(self.style.SUCCESS('Бюджет запуска соблюдён'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from mainapp.inventory import release_expired_reservations
+
+
+class Command(BaseCommand):
+
+    help = 'Возврат на склад товаров из истёкших резервов'
+
+    def handle(self, *args, **options):
+        released = release_expired_reservations()
+        self.stdout.write(self.style.SUCCESS(f'Снято резервов: {released}'))
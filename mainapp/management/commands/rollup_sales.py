@@ -0,0 +1,130 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from mainapp.models import Order, CartProduct, RollupWatermark, DailySales, DailyCategorySales, \
+    DailyProductSales
+
+
+COUNTERS = ('orders_count', 'products_count', 'revenue')
+PRODUCT_COUNTERS = ('orders_count', 'quantity', 'revenue')
+
+
+def new_counters(*names):
+    return {name: Decimal(0) if name == 'revenue' else 0 for name in names}
+
+
+def merge_rollup(model, key_fields, rows, counters):
+    if not rows:
+        return
+    lookup = {f'{name}__in': {key[i] for key in rows} for i, name in enumerate(key_fields)}
+    existing = {
+        tuple(getattr(obj, name) for name in key_fields): obj
+        for obj in model.objects.filter(**lookup)
+    }
+    to_create, to_update = [], []
+    for key, values in rows.items():
+        obj = existing.get(key)
+        if obj is None:
+            to_create.append(model(**dict(zip(key_fields, key)), **values))
+            continue
+        for name in counters:
+            setattr(obj, name, getattr(obj, name) + values[name])
+        for name, value in values.items():
+            if name not in counters:
+                setattr(obj, name, value)
+        to_update.append(obj)
+    model.objects.bulk_create(to_create)
+    if to_update:
+        model.objects.bulk_update(to_update, list(next(iter(rows.values()))))
+
+
+class Command(BaseCommand):
+
+    help = 'Инкрементальный пересчёт дневных сводок продаж по заказам, появившимся после прошлого запуска'
+
+    WATERMARK = 'sales'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--lag', type=int, default=60,
+            help='Не обрабатывать заказы моложе указанного числа секунд, чтобы не пропустить незавершённые транзакции'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        cutoff = timezone.now() - timedelta(seconds=options['lag'])
+        processed = 0
+        while True:
+            with transaction.atomic():
+                watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=self.WATERMARK)
+                orders = list(
+                    Order.objects.filter(id__gt=watermark.last_id).order_by('id')
+                    .values_list('id', 'placed_at', 'cart_id')[:batch_size]
+                )
+                ready = []
+                for order in orders:
+                    if order[1] > cutoff:
+                        break
+                    ready.append(order)
+                if not ready:
+                    break
+                self.rollup(ready)
+                watermark.last_id = ready[-1][0]
+                watermark.save()
+            processed += len(ready)
+            if len(ready) < len(orders):
+                break
+        self.stdout.write(self.style.SUCCESS(f'Обработано заказов: {processed}'))
+
+    def rollup(self, orders):
+        items = defaultdict(list)
+        product_ids = defaultdict(set)
+        cart_products = CartProduct.objects.filter(
+            cart_id__in={cart_id for _, _, cart_id in orders if cart_id}
+        ).values_list('cart_id', 'content_type_id', 'object_id', 'quantity', 'total_price')
+        for cart_id, content_type_id, object_id, quantity, total_price in cart_products:
+            items[cart_id].append((content_type_id, object_id, quantity, total_price))
+            product_ids[content_type_id].add(object_id)
+
+        products = {}
+        for content_type_id, ids in product_ids.items():
+            model = ContentType.objects.get_for_id(content_type_id).model_class()
+            for pk, title, category_id in model._base_manager.filter(id__in=ids).values_list(
+                    'id', 'title', 'category_id'):
+                products[content_type_id, pk] = (title, category_id)
+
+        days = defaultdict(lambda: new_counters(*COUNTERS))
+        categories = defaultdict(lambda: new_counters(*COUNTERS))
+        product_rows = {}
+        for _, placed_at, cart_id in orders:
+            date = timezone.localdate(placed_at)
+            days[(date,)]['orders_count'] += 1
+            seen_categories = set()
+            for content_type_id, object_id, quantity, total_price in items.get(cart_id, ()):
+                if (content_type_id, object_id) not in products:
+                    continue
+                title, category_id = products[content_type_id, object_id]
+                for counters in (days[(date,)], categories[date, category_id]):
+                    counters['products_count'] += quantity
+                    counters['revenue'] += total_price
+                if category_id not in seen_categories:
+                    seen_categories.add(category_id)
+                    categories[date, category_id]['orders_count'] += 1
+                row = product_rows.setdefault(
+                    (date, content_type_id, object_id),
+                    dict(new_counters(*PRODUCT_COUNTERS), title=title, category_id=category_id)
+                )
+                row['orders_count'] += 1
+                row['quantity'] += quantity
+                row['revenue'] += total_price
+
+        merge_rollup(DailySales, ('date',), days, COUNTERS)
+        merge_rollup(DailyCategorySales, ('date', 'category_id'), categories, COUNTERS)
+        merge_rollup(DailyProductSales, ('date', 'content_type_id', 'object_id'), product_rows, PRODUCT_COUNTERS)
@@ -0,0 +1,54 @@
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from mainapp import jobs
+
+
+class Command(BaseCommand):
+
+    help = 'Обработчик фоновых задач из очереди в БД'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=getattr(settings, 'JOBS_WORKER_CONCURRENCY', 1))
+        parser.add_argument('--poll-interval', type=float, default=getattr(settings, 'JOBS_POLL_INTERVAL', 1))
+        parser.add_argument('--burst', action='store_true', help='Завершить работу, когда очередь опустеет')
+
+    def handle(self, *args, **options):
+        jobs.autodiscover()
+        concurrency = max(options['concurrency'], 1)
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.stdout.write(f'Обработчик {worker} запущен, потоков: {concurrency}')
+        in_flight = set()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            try:
+                while True:
+                    close_old_connections()
+                    jobs.requeue_stale_jobs()
+                    # Новые задачи берём по мере освобождения потоков: долгая задача не держит остальные
+                    claimed = jobs.claim_jobs(worker, concurrency - len(in_flight))
+                    in_flight |= {executor.submit(self.run, job) for job in claimed}
+                    if not in_flight:
+                        if options['burst']:
+                            break
+                        time.sleep(options['poll_interval'])
+                        continue
+                    timeout = None if len(in_flight) == concurrency else options['poll_interval']
+                    done, in_flight = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self.stdout.write(str(future.result()))
+            except KeyboardInterrupt:
+                pass
+
+    @staticmethod
+    def run(job):
+        try:
+            jobs.run_job(job)
+        finally:
+            connection.close()
+        return job
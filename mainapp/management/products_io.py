@@ -0,0 +1,63 @@
+import csv
+import json
+import os
+
+from django.conf import settings
+
+from mainapp.models import Notebook, Smartphone
+
+
+PRODUCT_MODELS = {
+    'notebook': Notebook,
+    'smartphone': Smartphone,
+}
+
+FORMATS = ('csv', 'jsonl')
+
+
+def get_product_fields(model):
+    return [
+        field for field in model._meta.concrete_fields
+        if not field.primary_key
+    ]
+
+
+def get_export_columns(model):
+    return [field.name for field in get_product_fields(model)]
+
+
+def guess_format(path, default='csv'):
+    ext = os.path.splitext(path or '')[1].lower().lstrip('.')
+    if ext in ('jsonl', 'ndjson'):
+        return 'jsonl'
+    if ext == 'csv':
+        return 'csv'
+    return default
+
+
+def read_rows(stream, fmt):
+    if fmt == 'csv':
+        for line_no, row in enumerate(csv.DictReader(stream), start=2):
+            yield line_no, row
+        return
+    for line_no, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_no, e
+            continue
+        yield line_no, row
+
+
+def normalize_image_path(value):
+    value = (value or '').strip().replace('\\', '/')
+    media_root = str(settings.MEDIA_ROOT).replace('\\', '/').rstrip('/') + '/'
+    media_url = settings.MEDIA_URL
+    if value.startswith(media_root):
+        value = value[len(media_root):]
+    elif media_url and value.startswith(media_url):
+        value = value[len(media_url):]
+    return value.lstrip('/')
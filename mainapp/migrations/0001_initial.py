@@ -0,0 +1,139 @@
+# Generated by Django 3.1.6 on 2026-10-19 10:38
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Cart',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_products', models.PositiveIntegerField(default=0)),
+                ('total_price', models.DecimalField(decimal_places=3, default=0, max_digits=12, verbose_name='Общая цена')),
+                ('in_order', models.BooleanField(default=False)),
+                ('for_anonymous_user', models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=250, verbose_name='Имя категории')),
+                ('slug', models.SlugField(unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Customer',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone', models.CharField(blank=True, max_length=20, null=True, verbose_name='Номер телефона')),
+                ('address', models.CharField(blank=True, max_length=255, null=True, verbose_name='Адрес')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Smartphone',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255, verbose_name='Наименование')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Цена')),
+                ('image', models.ImageField(upload_to='', verbose_name='Изображение')),
+                ('description', models.TextField(max_length=5000, null=True, verbose_name='Описание')),
+                ('slug', models.SlugField(unique=True)),
+                ('diagonal', models.CharField(max_length=255, verbose_name='Диагональ')),
+                ('display_type', models.CharField(max_length=255, verbose_name='Тип дисплея')),
+                ('resolution', models.CharField(max_length=255, verbose_name='Разрешение')),
+                ('accum_volume', models.CharField(max_length=255, verbose_name='Объём батареи')),
+                ('ram', models.CharField(max_length=255, verbose_name='Оперативная память')),
+                ('sd', models.BooleanField(default=True, verbose_name='Наличие SD карты')),
+                ('sd_volume_max', models.CharField(blank=True, choices=[('16', '16 Gb'), ('32', '32 Gb'), ('8', '8 Gb'), ('128', '128 Gb'), ('64', '64 Gb')], default='8', max_length=255, null=True, verbose_name='Максимальный объём памяти')),
+                ('main_cam', models.CharField(max_length=255, verbose_name='Главная камера')),
+                ('frontal_cam', models.CharField(max_length=255, verbose_name='Фронтальная камера')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mainapp.category', verbose_name='Категория')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Order',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_name', models.CharField(max_length=255, verbose_name='Имя')),
+                ('last_name', models.CharField(max_length=255, verbose_name='Фамилия')),
+                ('phone', models.CharField(max_length=20, verbose_name='Телефон')),
+                ('address', models.CharField(blank=True, max_length=255, null=True, verbose_name='Адрес')),
+                ('status', models.CharField(choices=[('new', 'Новый заказ'), ('new', 'Заказ в обработке'), ('in_ready', 'Заказ готов'), ('completed', 'Заказ выполнен')], default='new', max_length=100, verbose_name='Статус заказа')),
+                ('buying_type', models.CharField(choices=[('self', 'Самовывоз'), ('delivery', 'Доставка')], default='self', max_length=100, verbose_name='Тип заказа')),
+                ('comment', models.TextField(blank=True, max_length=5000, null=True, verbose_name='Комментарий к заказу')),
+                ('created_at', models.DateTimeField(auto_now=True, verbose_name='Дата создания заказа')),
+                ('order_date', models.DateField(default=django.utils.timezone.now, verbose_name='Дата получения заказа')),
+                ('cart', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='mainapp.cart', verbose_name='Корзина')),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_orders', to='mainapp.customer', verbose_name='Покупатель')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Notebook',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255, verbose_name='Наименование')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Цена')),
+                ('image', models.ImageField(upload_to='', verbose_name='Изображение')),
+                ('description', models.TextField(max_length=5000, null=True, verbose_name='Описание')),
+                ('slug', models.SlugField(unique=True)),
+                ('diagonal', models.CharField(max_length=255, verbose_name='Диагональ')),
+                ('display_type', models.CharField(max_length=255, verbose_name='Тип дисплея')),
+                ('processor_freq', models.CharField(max_length=255, verbose_name='Частота процессора')),
+                ('ram', models.CharField(max_length=255, verbose_name='Оперативная память')),
+                ('video', models.CharField(max_length=255, verbose_name='Видеокарта')),
+                ('time_without_charge', models.CharField(max_length=255, verbose_name='Время работы аккумулятора')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mainapp.category', verbose_name='Категория')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='orders',
+            field=models.ManyToManyField(related_name='related_customer', to='mainapp.Order', verbose_name='Заказы покупателя'),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.CreateModel(
+            name='CartProduct',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('total_price', models.DecimalField(decimal_places=3, max_digits=12, verbose_name='Общая цена')),
+                ('cart', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_products', to='mainapp.cart', verbose_name='Корзина')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mainapp.customer', verbose_name='Покупатель')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='owner',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='mainapp.customer', verbose_name='Владелец'),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='products',
+            field=models.ManyToManyField(blank=True, related_name='related_cart', to='mainapp.CartProduct'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 3.1.6 on 2026-10-19 10:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('mainapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='Дата')),
+                ('orders_count', models.PositiveIntegerField(default=0, verbose_name='Кол-во заказов')),
+                ('products_count', models.PositiveIntegerField(default=0, verbose_name='Кол-во товаров')),
+                ('revenue', models.DecimalField(decimal_places=3, default=0, max_digits=14, verbose_name='Выручка')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Имя сводки')),
+                ('last_id', models.PositiveIntegerField(default=0, verbose_name='Последний обработанный id')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyProductSales',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True, verbose_name='Дата')),
+                ('object_id', models.PositiveIntegerField()),
+                ('title', models.CharField(max_length=255, verbose_name='Наименование')),
+                ('orders_count', models.PositiveIntegerField(default=0, verbose_name='Кол-во заказов')),
+                ('quantity', models.PositiveIntegerField(default=0, verbose_name='Кол-во товаров')),
+                ('revenue', models.DecimalField(decimal_places=3, default=0, max_digits=14, verbose_name='Выручка')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mainapp.category', verbose_name='Категория')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'unique_together': {('date', 'content_type', 'object_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyCategorySales',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('orders_count', models.PositiveIntegerField(default=0, verbose_name='Кол-во заказов')),
+                ('products_count', models.PositiveIntegerField(default=0, verbose_name='Кол-во товаров')),
+                ('revenue', models.DecimalField(decimal_places=3, default=0, max_digits=14, verbose_name='Выручка')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mainapp.category', verbose_name='Категория')),
+            ],
+            options={
+                'unique_together': {('date', 'category')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def copy_created_at(apps, schema_editor):
+    # Для старых заказов точная дата оформления не сохранилась, берём последнюю известную
+    Order = apps.get_model('mainapp', 'Order')
+    Order.objects.update(placed_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0006_recommendations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='placed_at',
+            field=models.DateTimeField(
+                auto_now_add=True, db_index=True, default=django.utils.timezone.now,
+                verbose_name='Дата оформления заказа'
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_created_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0007_order_placed_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cartproduct',
+            name='created_at',
+            field=models.DateTimeField(
+                auto_now_add=True, default=django.utils.timezone.now, verbose_name='Дата добавления'
+            ),
+            preserve_default=False,
+        ),
+    ]
@@ -1,3 +1,4 @@
+from django.contrib.auth.mixins import UserPassesTestMixin
 from django.views.generic.detail import SingleObjectMixin
 from django.views.generic import View
 
@@ -12,8 +13,8 @@ class CategoryDetailMixin(SingleObjectMixin):
     }
 
     def get_context_data(self, *args, **kwargs):
-        if isinstance(self.get_object(), Category):
-            model = self.CATEGORY_SLUG_TO_PRODUCT_MODEL[self.get_object().slug]
+        if isinstance(self.object, Category):
+            model = self.CATEGORY_SLUG_TO_PRODUCT_MODEL[self.object.slug]
             context = super().get_context_data(**kwargs)
             context['categories'] = Category.objects.get_categories_for_sidebar()
             context['category_products'] = model.objects.all()
@@ -49,3 +50,11 @@ class CartMixin(View):
                 cart = Cart.objects.create(for_anonymous_user=True)
         self.cart = cart
         return super().dispatch(request, *args, **kwargs)
+
+
+class StaffRequiredMixin(UserPassesTestMixin):
+
+    login_url = '/admin/login/'
+
+    def test_func(self):
+        return self.request.user.is_active and self.request.user.is_staff
@@ -88,6 +88,7 @@ class Product(models.Model):
     image = models.ImageField("Изображение")
     description = models.TextField("Описание", max_length=5000, null=True)
     slug = models.SlugField(unique=True)
+    stock = models.PositiveIntegerField("Остаток на складе", default=0)
 
     def __str__(self):
         return self.title
@@ -114,13 +115,13 @@ class Notebook(Product):
 
 class Smartphone(Product):
 
-    SD_VOLUME = {
+    SD_VOLUME = (
         ('8', '8 Gb'),
         ('16', '16 Gb'),
         ('32', '32 Gb'),
         ('64', '64 Gb'),
         ('128', '128 Gb'),
-    }
+    )
 
     diagonal = models.CharField("Диагональ", max_length=255)
     display_type = models.CharField("Тип дисплея", max_length=255)
@@ -151,6 +152,7 @@ class CartProduct(models.Model):
     content_object = GenericForeignKey('content_type', 'object_id')
     quantity = models.PositiveIntegerField(default=1)
     total_price = models.DecimalField("Общая цена", max_digits=12, decimal_places=3)
+    created_at = models.DateTimeField("Дата добавления", auto_now_add=True)
 
     def __str__(self):
         return f'Продукт: {self.content_object.title}'
@@ -168,11 +170,26 @@ class Cart(models.Model):
     total_price = models.DecimalField("Общая цена", default=0, max_digits=12, decimal_places=3)
     in_order = models.BooleanField(default=False)
     for_anonymous_user = models.BooleanField(default=False)
+    version = models.PositiveIntegerField("Версия", default=0)
 
     def __str__(self):
         return str(self.id)
 
 
+class StockReservation(models.Model):
+
+    cart = models.ForeignKey(Cart, verbose_name="Корзина", related_name='reservations', on_delete=models.CASCADE)
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey('content_type', 'object_id')
+    quantity = models.PositiveIntegerField("Кол-во")
+    expires_at = models.DateTimeField("Действует до", null=True, blank=True, db_index=True)
+    created_at = models.DateTimeField("Дата создания", auto_now_add=True)
+
+    def __str__(self):
+        return f'Резерв: корзина {self.cart_id}, {self.quantity} шт.'
+
+
 class Customer(models.Model):
 
     user = models.ForeignKey(User, verbose_name='Пользователь', on_delete=models.CASCADE)
@@ -216,7 +233,133 @@ class Order(models.Model):
     buying_type = models.CharField("Тип заказа", max_length=100, choices=BUYING_TYPE_CHOICES, default=BUYING_TYPE_SELF)
     comment = models.TextField("Комментарий к заказу", max_length=5000, null=True, blank=True)
     created_at = models.DateTimeField("Дата создания заказа", auto_now=True)
+    placed_at = models.DateTimeField("Дата оформления заказа", auto_now_add=True, db_index=True)
     order_date = models.DateField("Дата получения заказа", default=timezone.now)
 
     def __str__(self):
         return str(self.id)
+
+
+class RollupWatermark(models.Model):
+
+    name = models.CharField("Имя сводки", max_length=100, unique=True)
+    last_id = models.PositiveIntegerField("Последний обработанный id", default=0)
+    updated_at = models.DateTimeField("Дата обновления", auto_now=True)
+
+    def __str__(self):
+        return f'{self.name}: {self.last_id}'
+
+
+class DailySales(models.Model):
+
+    date = models.DateField("Дата", unique=True)
+    orders_count = models.PositiveIntegerField("Кол-во заказов", default=0)
+    products_count = models.PositiveIntegerField("Кол-во товаров", default=0)
+    revenue = models.DecimalField("Выручка", default=0, max_digits=14, decimal_places=3)
+
+    def __str__(self):
+        return f'{self.date}: {self.revenue}'
+
+
+class DailyCategorySales(models.Model):
+
+    class Meta:
+        unique_together = ('date', 'category')
+
+    date = models.DateField("Дата")
+    category = models.ForeignKey(Category, verbose_name="Категория", on_delete=models.CASCADE)
+    orders_count = models.PositiveIntegerField("Кол-во заказов", default=0)
+    products_count = models.PositiveIntegerField("Кол-во товаров", default=0)
+    revenue = models.DecimalField("Выручка", default=0, max_digits=14, decimal_places=3)
+
+    def __str__(self):
+        return f'{self.date} {self.category}: {self.revenue}'
+
+
+class DailyProductSales(models.Model):
+
+    class Meta:
+        unique_together = ('date', 'content_type', 'object_id')
+
+    date = models.DateField("Дата", db_index=True)
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    category = models.ForeignKey(Category, verbose_name="Категория", on_delete=models.CASCADE)
+    title = models.CharField("Наименование", max_length=255)
+    orders_count = models.PositiveIntegerField("Кол-во заказов", default=0)
+    quantity = models.PositiveIntegerField("Кол-во товаров", default=0)
+    revenue = models.DecimalField("Выручка", default=0, max_digits=14, decimal_places=3)
+
+    def __str__(self):
+        return f'{self.date} {self.title}: {self.revenue}'
+
+
+class Job(models.Model):
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, 'В очереди'),
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_DONE, 'Выполнена'),
+        (STATUS_FAILED, 'Ошибка'),
+    )
+
+    class Meta:
+        index_together = ('status', 'run_at')
+
+    name = models.CharField("Задача", max_length=255)
+    payload = models.JSONField("Параметры", default=dict, blank=True)
+    status = models.CharField("Статус", max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.PositiveIntegerField("Попыток", default=0)
+    max_attempts = models.PositiveIntegerField("Макс. попыток", default=5)
+    run_at = models.DateTimeField("Запустить не раньше", default=timezone.now)
+    locked_by = models.CharField("Обработчик", max_length=255, null=True, blank=True)
+    locked_at = models.DateTimeField("Взята в работу", null=True, blank=True)
+    last_error = models.TextField("Последняя ошибка", null=True, blank=True)
+    created_at = models.DateTimeField("Дата создания", auto_now_add=True)
+    finished_at = models.DateTimeField("Дата завершения", null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.name} #{self.id} ({self.status})'
+
+
+class ProductCooccurrence(models.Model):
+
+    class Meta:
+        unique_together = ('content_type', 'object_id', 'related_content_type', 'related_object_id')
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name='+')
+    object_id = models.PositiveIntegerField()
+    related_content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name='+')
+    related_object_id = models.PositiveIntegerField()
+    count = models.PositiveIntegerField("Кол-во совместных покупок", default=0)
+
+    def __str__(self):
+        return f'{self.content_type_id}:{self.object_id} - {self.related_content_type_id}:{self.related_object_id}'
+
+
+class RelatedProduct(models.Model):
+
+    class Meta:
+        unique_together = ('content_type', 'object_id', 'rank')
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name='+')
+    object_id = models.PositiveIntegerField()
+    rank = models.PositiveIntegerField("Позиция")
+    related_content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name='+')
+    related_object_id = models.PositiveIntegerField()
+    score = models.PositiveIntegerField("Кол-во совместных покупок")
+    title = models.CharField("Наименование", max_length=255)
+    slug = models.SlugField()
+    price = models.DecimalField("Цена", max_digits=12, decimal_places=2)
+    image = models.ImageField("Изображение")
+
+    def __str__(self):
+        return f'{self.content_type_id}:{self.object_id} #{self.rank}: {self.title}'
+
+    def get_absolute_url(self):
+        return reverse('product_detail', kwargs={'ct_model': self.related_content_type.model, 'slug': self.slug})
@@ -0,0 +1,38 @@
+from django.contrib.contenttypes.models import ContentType
+
+from .models import RelatedProduct
+
+
+COPIED_FIELDS = ('title', 'slug', 'price', 'image')
+
+
+def refresh_related_products(model, ids=None):
+    # Рекомендации хранят копию карточки, чтобы страница товара строилась одним запросом,
+    # поэтому после изменения товара копии обновляются, а ссылки на удалённые товары убираются
+    related = RelatedProduct.objects.filter(related_content_type=ContentType.objects.get_for_model(model))
+    if ids is not None:
+        related = related.filter(related_object_id__in=ids)
+    copies = set(related.values_list('related_object_id', *COPIED_FIELDS).distinct())
+    if not copies:
+        return 0
+    current = {
+        row[0]: row for row in model._base_manager.filter(
+            id__in={copy[0] for copy in copies}).values_list('id', *COPIED_FIELDS)
+    }
+    stale = {copy[0] for copy in copies if current.get(copy[0]) != copy}
+    related.filter(related_object_id__in=stale - set(current)).delete()
+    for pk in stale & set(current):
+        related.filter(related_object_id=pk).update(**dict(zip(COPIED_FIELDS, current[pk][1:])))
+    return len(stale)
+
+
+def product_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_related_products(sender, ids=[instance.pk])
+
+
+def product_deleted(sender, instance, **kwargs):
+    RelatedProduct.objects.filter(
+        content_type=ContentType.objects.get_for_model(sender), object_id=instance.pk
+    ).delete()
+    refresh_related_products(sender, ids=[instance.pk])
@@ -0,0 +1,19 @@
+import logging
+
+from .jobs import job
+from .models import Order
+
+logger = logging.getLogger(__name__)
+
+
+@job('notify_order_created')
+def notify_order_created(order_id):
+    # Пример фоновой задачи: уведомление менеджеров пишется в журнал. Рассылку писем
+    # можно добавить здесь же, после того как для проекта будут настроены EMAIL_*
+    order = Order.objects.select_related('cart').get(id=order_id)
+    total_price = order.cart.total_price if order.cart else 0
+    logger.info(
+        'Новый заказ №%s: %s %s, телефон %s, %s, дата получения %s, сумма %s руб.',
+        order.id, order.first_name, order.last_name, order.phone, order.get_buying_type_display(),
+        order.order_date, total_price
+    )
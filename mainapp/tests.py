@@ -1,3 +1,833 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections, router, transaction
+from django.db.utils import ConnectionHandler
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import jobs, views
+from .management.products_io import normalize_image_path
+from .inventory import OutOfStock, reserve_cart, confirm_cart, release_expired_reservations
+from .utils import recalc_cart
+from .models import Job, Category, Notebook, Customer, Cart, CartProduct, StockReservation, Order, \
+    RelatedProduct, DailySales, DailyCategorySales, DailyProductSales
 
 # Create your tests here.
+
+CALLS = []
+
+
+@jobs.job('tests.record')
+def record(value):
+    CALLS.append(value)
+
+
+@jobs.job('tests.fail')
+def fail():
+    raise RuntimeError('boom')
+
+
+class EnqueueTestCase(TransactionTestCase):
+
+    def test_job_is_created_after_commit(self):
+        with transaction.atomic():
+            jobs.enqueue('tests.record', value=1)
+            self.assertFalse(Job.objects.exists())
+        job = Job.objects.get()
+        self.assertEqual(job.name, 'tests.record')
+        self.assertEqual(job.payload, {'value': 1})
+
+    def test_job_is_dropped_on_rollback(self):
+        try:
+            with transaction.atomic():
+                jobs.enqueue('tests.record', value=1)
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertFalse(Job.objects.exists())
+
+
+@override_settings(JOBS_RETRY_DELAY=10)
+class RunJobsTestCase(TestCase):
+
+    def setUp(self):
+        CALLS.clear()
+
+    def test_run_pending(self):
+        job = Job.objects.create(name='tests.record', payload={'value': 42})
+        Job.objects.create(name='tests.record', payload={'value': 0}, run_at=timezone.now() + timedelta(hours=1))
+        self.assertEqual(jobs.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_DONE)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(CALLS, [42])
+
+    def test_failed_job_is_retried_with_backoff(self):
+        job = Job.objects.create(name='tests.fail', max_attempts=2)
+        with self.assertLogs('mainapp.jobs', 'WARNING'):
+            jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_QUEUED)
+        self.assertIn('boom', job.last_error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=5))
+        self.assertEqual(jobs.run_pending(), 0)
+
+        Job.objects.filter(id=job.id).update(run_at=timezone.now())
+        with self.assertLogs('mainapp.jobs', 'ERROR'):
+            jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_unknown_job_fails_immediately(self):
+        job = Job.objects.create(name='tests.unknown')
+        with self.assertLogs('mainapp.jobs', 'ERROR'):
+            jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+
+    def test_claimed_job_is_not_claimed_twice(self):
+        Job.objects.create(name='tests.record', payload={'value': 1})
+        self.assertEqual(len(jobs.claim_jobs('first', 10)), 1)
+        self.assertEqual(jobs.claim_jobs('second', 10), [])
+
+    def test_stale_job_is_requeued(self):
+        job = Job.objects.create(
+            name='tests.record', payload={'value': 1}, status=Job.STATUS_RUNNING,
+            locked_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(jobs.requeue_stale_jobs(timeout=60), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_QUEUED)
+
+    def test_stale_job_without_attempts_left_fails(self):
+        job = Job.objects.create(
+            name='tests.record', payload={'value': 1}, status=Job.STATUS_RUNNING, attempts=3, max_attempts=3,
+            locked_at=timezone.now() - timedelta(hours=1)
+        )
+        with self.assertLogs('mainapp.jobs', 'ERROR'):
+            self.assertEqual(jobs.requeue_stale_jobs(timeout=60), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_heartbeat_refreshes_only_own_job(self):
+        Job.objects.create(name='tests.record', payload={'value': 1}, run_at=timezone.now() - timedelta(hours=1))
+        job = jobs.claim_jobs('first', 1)[0]
+        Job.objects.filter(id=job.id).update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(jobs.Heartbeat(job, 60).beat(), 1)
+        self.assertEqual(jobs.requeue_stale_jobs(timeout=60), 0)
+
+        Job.objects.filter(id=job.id).update(locked_at=timezone.now() - timedelta(hours=1))
+        jobs.requeue_stale_jobs(timeout=60)
+        self.assertEqual(jobs.Heartbeat(job, 60).beat(), 0)
+
+
+@jobs.job('tests.slow')
+def slow(seconds):
+    time.sleep(seconds)
+    CALLS.append('slow')
+
+
+class HeartbeatTestCase(TransactionTestCase):
+
+    @override_settings(JOBS_HEARTBEAT_INTERVAL=0.05)
+    def test_long_job_keeps_its_lock(self):
+        Job.objects.create(name='tests.slow', payload={'seconds': 0.3})
+        job = jobs.claim_jobs('first', 1)[0]
+        with mock.patch.object(jobs.Heartbeat, 'beat', autospec=True, side_effect=jobs.Heartbeat.beat) as beat:
+            self.assertEqual(jobs.run_job(job), Job.STATUS_DONE)
+        self.assertGreater(beat.call_count, 1)
+
+
+class RunJobsCommandTestCase(TransactionTestCase):
+
+    def test_slow_job_does_not_block_other_threads(self):
+        CALLS.clear()
+        Job.objects.create(name='tests.slow', payload={'seconds': 0.5})
+        for value in range(3):
+            Job.objects.create(name='tests.record', payload={'value': value})
+        call_command('run_jobs', concurrency=2, poll_interval=0.01, burst=True, stdout=StringIO())
+        self.assertEqual(CALLS, [0, 1, 2, 'slow'])
+        self.assertEqual(Job.objects.filter(status=Job.STATUS_DONE).count(), 4)
+
+
+def create_notebook(stock, slug='notebook'):
+    category, _ = Category.objects.get_or_create(name='Ноутбуки', slug='notebooks')
+    return Notebook.objects.create(
+        title='Ноутбук', category=category, price=100, image='notebook.jpg', description='', slug=slug,
+        diagonal='15', display_type='IPS', processor_freq='2', ram='8', video='-', time_without_charge='5',
+        stock=stock
+    )
+
+
+def create_cart(product, quantity, username):
+    customer = Customer.objects.create(user=get_user_model().objects.create(username=username))
+    cart = Cart.objects.create(owner=customer)
+    cart_product = CartProduct.objects.create(
+        user=customer, cart=cart, content_type=ContentType.objects.get_for_model(product),
+        object_id=product.id, quantity=quantity
+    )
+    cart.products.add(cart_product)
+    return cart
+
+
+class InventoryTestCase(TestCase):
+
+    def setUp(self):
+        self.product = create_notebook(stock=5)
+
+    def test_reserve_and_confirm(self):
+        cart = create_cart(self.product, 3, 'first')
+        reserve_cart(cart)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 2)
+        confirm_cart(cart)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 2)
+        self.assertFalse(cart.reservations.filter(expires_at__isnull=False).exists())
+
+    def test_reserve_again_replaces_previous_reservation(self):
+        cart = create_cart(self.product, 3, 'first')
+        reserve_cart(cart)
+        reserve_cart(cart)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 2)
+        self.assertEqual(cart.reservations.count(), 1)
+
+    def test_out_of_stock_leaves_stock_untouched(self):
+        cart = create_cart(self.product, 6, 'first')
+        with self.assertRaises(OutOfStock) as e:
+            reserve_cart(cart)
+        self.assertEqual(e.exception.products, [self.product])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 5)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_expired_reservation_is_released(self):
+        cart = create_cart(self.product, 3, 'first')
+        reserve_cart(cart)
+        cart.reservations.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(release_expired_reservations(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 5)
+
+    def test_confirm_reserves_again_after_expiry(self):
+        cart = create_cart(self.product, 3, 'first')
+        reserve_cart(cart)
+        cart.reservations.update(expires_at=timezone.now() - timedelta(seconds=1))
+        confirm_cart(cart)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 2)
+        self.assertEqual(cart.reservations.get().expires_at, None)
+
+
+class CartStockViewsTestCase(TestCase):
+
+    def setUp(self):
+        self.product = create_notebook(stock=5)
+        self.cart = create_cart(self.product, 3, 'buyer')
+        self.client.force_login(self.cart.owner.user)
+        self.change_url = reverse('change_quantity', kwargs={'ct_model': 'notebook', 'slug': self.product.slug})
+
+    def assertStock(self, stock):
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, stock)
+
+    def make_order(self):
+        return self.client.post(reverse('make_order'), {
+            'first_name': 'Иван', 'last_name': 'Иванов', 'phone': '1', 'address': '',
+            'buying_type': Order.BUYING_TYPE_SELF, 'order_date': timezone.localdate().isoformat(), 'comment': '',
+        })
+
+    def test_checkout_reserves_for_owner_cart(self):
+        self.assertEqual(self.client.get(reverse('checkout')).status_code, 200)
+        self.assertEqual(self.client.get(reverse('checkout')).status_code, 200)
+        reservation = self.cart.reservations.get()
+        self.assertEqual(reservation.quantity, 3)
+        self.assertGreater(reservation.expires_at, timezone.now())
+        self.assertStock(2)
+
+        self.make_order()
+        self.assertEqual(self.cart.reservations.get().expires_at, None)
+        self.assertStock(2)
+
+    def test_anonymous_checkout_does_not_reserve(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('checkout')).status_code, 200)
+        self.assertFalse(StockReservation.objects.exists())
+        self.assertStock(5)
+
+    def test_expired_checkout_reservation_is_released(self):
+        self.client.get(reverse('checkout'))
+        self.cart.reservations.update(expires_at=timezone.now() - timedelta(seconds=1))
+        stdout = StringIO()
+        call_command('release_reservations', stdout=stdout)
+        self.assertIn('Снято резервов: 1', stdout.getvalue())
+        self.assertStock(5)
+
+    def test_change_quantity_counts_own_reservation(self):
+        self.client.get(reverse('checkout'))
+        response = self.client.post(self.change_url, {'quantity': 6}, follow=True)
+        self.assertContains(response, 'Доступно только 5 шт.')
+        response = self.client.post(self.change_url, {'quantity': 3}, follow=True)
+        self.assertContains(response, 'Кол-во успешно изменено')
+        # Резерв под прежний состав корзины снят, при оформлении он будет сделан заново
+        self.assertFalse(self.cart.reservations.exists())
+        self.assertStock(5)
+
+    def test_failed_order_returns_stock(self):
+        self.client.get(reverse('checkout'))
+        with mock.patch('mainapp.views.recalc_cart', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.make_order()
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(self.cart.reservations.exists())
+        self.assertStock(5)
+
+    def test_anonymous_user_cannot_order(self):
+        self.client.logout()
+        response = self.client.post(reverse('make_order'))
+        self.assertRedirects(response, '/checkout/', fetch_redirect_response=False)
+        self.assertFalse(Order.objects.exists())
+
+
+class ParallelCheckoutTestCase(TransactionTestCase):
+
+    THREADS = 10
+
+    def test_no_overselling(self):
+        product = create_notebook(stock=7)
+        carts = [create_cart(product, 2, f'user{i}') for i in range(self.THREADS)]
+        barrier = threading.Barrier(self.THREADS)
+        results = []
+
+        def checkout(cart):
+            barrier.wait()
+            try:
+                while True:
+                    try:
+                        confirm_cart(cart)
+                        results.append(True)
+                        return
+                    except OutOfStock:
+                        results.append(False)
+                        return
+                    except OperationalError:
+                        # SQLite в памяти блокирует таблицы целиком и не ждёт, повторяем как повторил бы клиент
+                        time.sleep(0.01)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout, args=(cart,)) for cart in carts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        self.assertEqual(len(results), self.THREADS)
+        self.assertEqual(results.count(True), 3)
+        self.assertEqual(product.stock, 1)
+        self.assertEqual(StockReservation.objects.filter(expires_at=None).count(), 3)
+
+
+@override_settings(
+    SQLITE_PRAGMAS={'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 5000},
+    DATABASE_ROUTERS=['djangoshop.db.PrimaryReplicaRouter'],
+    DATABASE_REPLICA_MODELS=('mainapp.category', 'mainapp.notebook', 'mainapp.smartphone'),
+)
+class DatabaseConfigTestCase(TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.databases_config = {
+            alias: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(tmp.name, f'{alias}.sqlite3')}
+            for alias in ('default', 'replica')
+        }
+
+    def test_sqlite_pragmas_are_applied_on_connect(self):
+        handler = ConnectionHandler(self.databases_config)
+        for alias in ('default', 'replica'):
+            with handler[alias].cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                self.assertEqual(cursor.fetchone()[0], 'wal')
+                cursor.execute('PRAGMA synchronous')
+                self.assertEqual(cursor.fetchone()[0], 1)
+                cursor.execute('PRAGMA busy_timeout')
+                self.assertEqual(cursor.fetchone()[0], 5000)
+        handler.close_all()
+
+    def test_catalog_reads_go_to_replica(self):
+        with mock.patch.dict(connections.databases, replica=self.databases_config['replica']):
+            self.assertEqual(Notebook.objects.all().db, 'replica')
+            self.assertEqual(Category.objects.all().db, 'replica')
+            self.assertEqual(Cart.objects.all().db, 'default')
+            self.assertEqual(Order.objects.all().db, 'default')
+            self.assertEqual(router.db_for_write(Notebook), 'default')
+
+    def test_reads_stay_on_primary_without_replica(self):
+        self.assertEqual(Notebook.objects.all().db, 'default')
+
+    def test_unusable_connection_is_closed_on_request(self):
+        self.databases_config['default']['CONN_HEALTH_CHECKS'] = True
+        handler = ConnectionHandler(self.databases_config)
+        self.addCleanup(handler.close_all)
+        for alias in ('default', 'replica'):
+            handler[alias].ensure_connection()
+        with mock.patch('djangoshop.db.connections', handler), \
+                mock.patch.object(handler['default'], 'is_usable', return_value=False), \
+                mock.patch.object(handler['replica'], 'is_usable', return_value=False):
+            self.client.get(reverse('cart_summary'))
+        # Соединение без CONN_HEALTH_CHECKS не проверяется и остаётся открытым
+        self.assertIsNone(handler['default'].connection)
+        self.assertIsNotNone(handler['replica'].connection)
+
+
+class CartSummaryTestCase(TestCase):
+
+    def setUp(self):
+        self.cart = Cart.objects.create(for_anonymous_user=True)
+        self.url = reverse('cart_summary')
+
+    def test_summary(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'total_products': 0, 'total_price': '0.000'})
+        self.assertEqual(response['ETag'], f'"{self.cart.id}-0"')
+
+    def test_unchanged_cart_is_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_changed_cart_gets_new_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        recalc_cart(self.cart)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_version_is_incremented_in_database(self):
+        stale = Cart.objects.get(pk=self.cart.pk)
+        recalc_cart(self.cart)
+        recalc_cart(stale)
+        self.assertEqual(stale.version, 2)
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.version, 2)
+
+
+class RecommendationsTestCase(TestCase):
+
+    def setUp(self):
+        self.first = create_notebook(stock=10, slug='first')
+        self.second = create_notebook(stock=10, slug='second')
+        self.third = create_notebook(stock=10, slug='third')
+
+    def add_to_cart(self, cart, product):
+        cart_product = CartProduct.objects.create(
+            user=cart.owner, cart=cart, content_type=ContentType.objects.get_for_model(product), object_id=product.id
+        )
+        cart.products.add(cart_product)
+
+    def recompute(self, lag=0, full=False):
+        stdout = StringIO()
+        call_command('compute_recommendations', lag=lag, full=full, stdout=stdout)
+        return stdout.getvalue()
+
+    def related_slugs(self, product):
+        return list(RelatedProduct.objects.filter(object_id=product.id).order_by('rank').values_list('slug', flat=True))
+
+    def test_related_products_are_ranked_by_cooccurrence(self):
+        cart = create_cart(self.first, 1, 'first')
+        self.add_to_cart(cart, self.second)
+        self.add_to_cart(cart, self.third)
+        self.recompute()
+        self.assertEqual(self.related_slugs(self.first), ['second', 'third'])
+
+        cart = create_cart(self.third, 1, 'second')
+        self.add_to_cart(cart, self.first)
+        self.recompute()
+        self.assertEqual(self.related_slugs(self.first), ['third', 'second'])
+        self.assertEqual(RelatedProduct.objects.get(object_id=self.first.id, rank=1).score, 2)
+
+    def test_recent_items_are_held_back(self):
+        cart = create_cart(self.first, 1, 'first')
+        self.add_to_cart(cart, self.second)
+        CartProduct.objects.update(created_at=timezone.now() - timedelta(hours=1))
+        self.add_to_cart(cart, self.third)
+        self.assertIn('Обработано товаров в корзинах: 2', self.recompute(lag=60))
+        self.assertEqual(self.related_slugs(self.first), ['second'])
+        self.assertIn('Обработано товаров в корзинах: 1', self.recompute())
+        self.assertEqual(self.related_slugs(self.first), ['second', 'third'])
+
+    def test_anonymous_cart_is_ignored(self):
+        customer = Customer.objects.create(user=get_user_model().objects.create(username='anonymous'))
+        cart = Cart.objects.create(owner=customer, for_anonymous_user=True)
+        self.add_to_cart(cart, self.first)
+        self.add_to_cart(cart, self.second)
+        self.recompute()
+        self.assertFalse(RelatedProduct.objects.exists())
+
+    def test_product_detail_queries(self):
+        cart = create_cart(self.first, 1, 'first')
+        self.add_to_cart(cart, self.second)
+        self.recompute()
+        Cart.objects.create(for_anonymous_user=True)
+        ContentType.objects.get_for_model(Notebook)
+        # корзина, товар с категорией, боковое меню и рекомендации
+        with self.assertNumQueries(4):
+            response = self.client.get(self.first.get_absolute_url())
+        self.assertContains(response, self.second.get_absolute_url())
+
+    def test_related_copies_follow_product_changes(self):
+        cart = create_cart(self.first, 1, 'first')
+        self.add_to_cart(cart, self.second)
+        self.add_to_cart(cart, self.third)
+        self.recompute()
+
+        self.second.title = 'Новое название'
+        self.second.price = 90
+        self.second.save()
+        related = RelatedProduct.objects.get(object_id=self.first.id, related_object_id=self.second.id)
+        self.assertEqual((related.title, related.price), ('Новое название', 90))
+
+        self.third.delete()
+        self.assertEqual(self.related_slugs(self.first), ['second'])
+        self.assertFalse(RelatedProduct.objects.filter(object_id=self.third.id).exists())
+
+        Notebook.objects.filter(id=self.second.id).update(slug='renamed')
+        self.assertNotIn('обновлено устаревших карточек', self.recompute())
+        self.assertEqual(self.related_slugs(self.first), ['second'])
+        self.assertIn('обновлено устаревших карточек: 1', self.recompute(full=True))
+        self.assertEqual(self.related_slugs(self.first), ['renamed'])
+
+
+NOTEBOOK_ROW = {
+    'title': 'Ноутбук', 'category': 'notebooks', 'price': '100.00', 'image': 'notebook.jpg',
+    'description': 'Описание', 'diagonal': '15', 'display_type': 'IPS', 'processor_freq': '2',
+    'ram': '8', 'video': '-', 'time_without_charge': '5',
+}
+
+
+class ProductImportExportTestCase(TestCase):
+
+    def setUp(self):
+        Category.objects.create(name='Ноутбуки', slug='notebooks')
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+
+    def write_csv(self, rows, name='products.csv'):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+
+    def write_jsonl(self, lines, name='products.jsonl'):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(line if isinstance(line, str) else json.dumps(line) for line in lines) + '\n')
+        return path
+
+    def import_products(self, path, **options):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_products', path, model='notebook', stdout=stdout, stderr=stderr, **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_create_update_and_unchanged_by_slug(self):
+        path = self.write_csv([dict(NOTEBOOK_ROW, slug='first'), dict(NOTEBOOK_ROW, slug='second')])
+        stdout, _ = self.import_products(path)
+        self.assertIn('создано 2, обновлено 0, без изменений 0', stdout)
+        first_id = Notebook.objects.get(slug='first').id
+
+        path = self.write_csv([
+            dict(NOTEBOOK_ROW, slug='first', price='99.50', title='Новый'), dict(NOTEBOOK_ROW, slug='second')
+        ])
+        stdout, _ = self.import_products(path)
+        self.assertIn('создано 0, обновлено 1, без изменений 1', stdout)
+        first = Notebook.objects.get(slug='first')
+        self.assertEqual(first.id, first_id)
+        self.assertEqual((first.title, str(first.price)), ('Новый', '99.50'))
+        self.assertEqual(first.category.slug, 'notebooks')
+        self.assertEqual(Notebook.objects.count(), 2)
+
+    def test_invalid_rows_are_skipped(self):
+        path = self.write_jsonl([
+            dict(NOTEBOOK_ROW, slug='valid'),
+            dict(NOTEBOOK_ROW, slug='unknown-category', category='tablets'),
+            '{not json',
+            dict(NOTEBOOK_ROW, slug='no-image', image=''),
+            dict(NOTEBOOK_ROW, slug='bad-price', price='abc'),
+        ])
+        stdout, stderr = self.import_products(path)
+        self.assertIn('создано 1', stdout)
+        self.assertIn('пропущено 4', stdout)
+        self.assertIn("Строка 2: неизвестная категория 'tablets'", stderr)
+        self.assertIn('Строка 3: некорректная строка', stderr)
+        self.assertIn('Строка 4: не указано изображение', stderr)
+        self.assertIn('Строка 5: price:', stderr)
+        self.assertEqual(list(Notebook.objects.values_list('slug', flat=True)), ['valid'])
+
+    def test_check_images(self):
+        path = self.write_csv([dict(NOTEBOOK_ROW, slug='first')])
+        with override_settings(MEDIA_ROOT=self.tmp):
+            _, stderr = self.import_products(path, check_images=True)
+        self.assertIn("файл изображения 'notebook.jpg' не найден", stderr)
+        self.assertFalse(Notebook.objects.exists())
+
+    def test_dry_run(self):
+        path = self.write_csv([dict(NOTEBOOK_ROW, slug='first')])
+        self.import_products(path, dry_run=True)
+        self.assertFalse(Notebook.objects.exists())
+
+    @override_settings(MEDIA_ROOT='/srv/media', MEDIA_URL='/media/')
+    def test_normalize_image_path(self):
+        self.assertEqual(normalize_image_path('/srv/media/products/a.jpg'), 'products/a.jpg')
+        self.assertEqual(normalize_image_path('/media/products/a.jpg'), 'products/a.jpg')
+        self.assertEqual(normalize_image_path('products\\a.jpg'), 'products/a.jpg')
+        self.assertEqual(normalize_image_path(' a.jpg '), 'a.jpg')
+        self.assertEqual(normalize_image_path(None), '')
+
+    def test_missing_columns_are_not_reset(self):
+        self.import_products(self.write_csv([dict(NOTEBOOK_ROW, slug='first', stock='7')]))
+        path = self.write_jsonl([{'slug': 'first', 'price': '90'}, {'slug': 'new', 'price': '90'}])
+        stdout, stderr = self.import_products(path)
+        self.assertIn('обновлено 1', stdout)
+        self.assertIn('Строка 2: не указана категория', stderr)
+        first = Notebook.objects.get(slug='first')
+        self.assertEqual(
+            (str(first.price), first.title, first.image.name, first.stock), ('90.00', 'Ноутбук', 'notebook.jpg', 7)
+        )
+
+        stdout, _ = self.import_products(self.write_csv([dict(NOTEBOOK_ROW, slug='first', price='90', ram='')]))
+        self.assertIn('без изменений 1', stdout)
+        self.assertEqual(Notebook.objects.get(slug='first').ram, '8')
+
+    def test_stock_is_updated_only_on_request(self):
+        product = create_notebook(stock=5, slug='first')
+        self.client.force_login(create_cart(product, 2, 'buyer').owner.user)
+        self.client.get(reverse('checkout'))
+        path = self.write_csv([{'slug': 'first', 'stock': '10'}])
+        stdout, _ = self.import_products(path)
+        self.assertIn('без изменений 1', stdout)
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 3)
+
+        stdout, _ = self.import_products(path, update_stock=True)
+        self.assertIn('обновлено 1', stdout)
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 8)
+        self.assertIn('без изменений 1', self.import_products(path, update_stock=True)[0])
+
+    def test_import_refreshes_related_products(self):
+        first, second = create_notebook(stock=1, slug='first'), create_notebook(stock=1, slug='second')
+        RelatedProduct.objects.create(
+            content_type=ContentType.objects.get_for_model(Notebook), object_id=first.id, rank=1,
+            related_content_type=ContentType.objects.get_for_model(Notebook), related_object_id=second.id,
+            score=1, title=second.title, slug=second.slug, price=second.price, image=second.image
+        )
+        self.import_products(self.write_csv([{'slug': 'second', 'title': 'Новое название'}]))
+        self.assertEqual(RelatedProduct.objects.get().title, 'Новое название')
+
+    def test_export_import_round_trip(self):
+        path = self.write_csv([
+            dict(NOTEBOOK_ROW, slug='first', description='Строка, с "кавычками"'), dict(NOTEBOOK_ROW, slug='second')
+        ])
+        self.import_products(path)
+        for fmt in ('csv', 'jsonl'):
+            with self.subTest(fmt=fmt):
+                output = os.path.join(self.tmp, f'export.{fmt}')
+                call_command('export_products', model='notebook', output=output, stderr=StringIO())
+                Notebook.objects.filter(slug='first').update(price=1, description='изменено')
+                stdout, _ = self.import_products(output)
+                self.assertIn('создано 0, обновлено 1, без изменений 1', stdout)
+                first = Notebook.objects.get(slug='first')
+                self.assertEqual((str(first.price), first.description), ('100.00', 'Строка, с "кавычками"'))
+                self.assertEqual(first.image.name, 'notebook.jpg')
+
+
+def create_order(cart, placed_at=None):
+    order = Order.objects.create(customer=cart.owner, first_name='Иван', last_name='Иванов', phone='1', cart=cart)
+    if placed_at is not None:
+        Order.objects.filter(pk=order.pk).update(placed_at=placed_at)
+        order.refresh_from_db()
+    return order
+
+
+class SalesRollupTestCase(TestCase):
+
+    def setUp(self):
+        self.product = create_notebook(stock=100)
+        self.placed_at = timezone.now() - timedelta(hours=1)
+
+    def create_order(self, quantity, username, placed_at=None):
+        cart = create_cart(self.product, quantity, username)
+        recalc_cart(cart)
+        return create_order(cart, placed_at or self.placed_at)
+
+    def rollup(self, lag=60):
+        stdout = StringIO()
+        call_command('rollup_sales', lag=lag, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_rollup_is_incremental(self):
+        self.create_order(2, 'first')
+        self.assertIn('Обработано заказов: 1', self.rollup())
+        self.assertIn('Обработано заказов: 0', self.rollup())
+        day = DailySales.objects.get()
+        self.assertEqual((day.orders_count, day.products_count, day.revenue), (1, 2, 200))
+
+        self.create_order(3, 'second')
+        self.assertIn('Обработано заказов: 1', self.rollup())
+        day.refresh_from_db()
+        self.assertEqual((day.orders_count, day.products_count, day.revenue), (2, 5, 500))
+        category = DailyCategorySales.objects.get()
+        self.assertEqual((category.orders_count, category.products_count, category.revenue), (2, 5, 500))
+        product = DailyProductSales.objects.get()
+        self.assertEqual((product.orders_count, product.quantity, product.revenue), (2, 5, 500))
+        self.assertEqual(product.date, timezone.localdate(self.placed_at))
+
+    def test_recent_orders_are_held_back(self):
+        self.create_order(1, 'first')
+        self.create_order(1, 'second', placed_at=timezone.now())
+        self.assertIn('Обработано заказов: 1', self.rollup(lag=60))
+        self.assertEqual(DailySales.objects.get().orders_count, 1)
+        self.assertIn('Обработано заказов: 1', self.rollup(lag=0))
+        self.assertEqual(DailySales.objects.get().orders_count, 2)
+
+    def test_order_is_bucketed_by_placement_date(self):
+        order = self.create_order(1, 'first', placed_at=self.placed_at - timedelta(days=3))
+        order.status = Order.STATUS_COMPLETED
+        order.save()
+        self.rollup()
+        self.assertEqual(DailySales.objects.get().date, timezone.localdate(self.placed_at - timedelta(days=3)))
+
+
+class SalesDashboardTestCase(TestCase):
+
+    def setUp(self):
+        self.url = reverse('sales_dashboard')
+        self.staff = get_user_model().objects.create(username='staff', is_staff=True)
+
+    def test_staff_only(self):
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+        self.client.force_login(get_user_model().objects.create(username='customer'))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_reads_only_rollup_tables(self):
+        create_order(create_cart(create_notebook(stock=10), 1, 'first'))
+        call_command('rollup_sales', lag=0, stdout=StringIO())
+        self.client.force_login(self.staff)
+        # Сессия и пользователь, затем по запросу на каждую сводку
+        with self.assertNumQueries(6), CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'days': 30})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['totals']['orders_count'], 1)
+        tables = ('mainapp_order', 'mainapp_cartproduct', 'mainapp_notebook', 'mainapp_smartphone')
+        self.assertFalse([query['sql'] for query in queries if any(table in query['sql'] for table in tables)])
+
+
+class OrderExportTestCase(TestCase):
+
+    def setUp(self):
+        self.url = reverse('export_orders')
+        product = create_notebook(stock=10)
+        today = timezone.now()
+        self.new_order = create_order(create_cart(product, 1, 'first'), today - timedelta(days=5))
+        self.completed_order = create_order(create_cart(product, 2, 'second'), today)
+        self.completed_order.status = Order.STATUS_COMPLETED
+        self.completed_order.save()
+        self.client.force_login(get_user_model().objects.create(username='staff', is_staff=True))
+
+    def export(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def exported_ids(self, **params):
+        rows = list(csv.DictReader(self.export(**params).splitlines()))
+        return [int(row['id']) for row in rows]
+
+    def test_staff_only(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+        self.client.force_login(get_user_model().objects.create(username='customer'))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_csv(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(tuple(rows[0]), views.OrderExportView.COLUMNS)
+        self.assertEqual(len(rows), 3)
+        first = dict(zip(rows[0], rows[1]))
+        self.assertEqual(first['id'], str(self.new_order.id))
+        self.assertEqual(first['username'], 'first')
+        self.assertEqual(first['placed_at'], self.new_order.placed_at.isoformat())
+
+    def test_jsonl(self):
+        lines = self.export(format='jsonl').splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], [self.new_order.id, self.completed_order.id])
+        self.assertEqual(json.loads(lines[1])['status'], Order.STATUS_COMPLETED)
+
+    def test_filters(self):
+        self.assertEqual(self.exported_ids(status=Order.STATUS_COMPLETED), [self.completed_order.id])
+        today = timezone.localdate()
+        self.assertEqual(self.exported_ids(date_from=today.isoformat()), [self.completed_order.id])
+        # Изменение заказа не переносит его в другой день
+        self.assertEqual(
+            self.exported_ids(date_to=(today - timedelta(days=1)).isoformat()), [self.new_order.id]
+        )
+        self.assertEqual(
+            self.exported_ids(date_from=(today - timedelta(days=5)).isoformat(), date_to=today.isoformat()),
+            [self.new_order.id, self.completed_order.id]
+        )
+
+    def test_bad_parameters(self):
+        for params in ({'format': 'xml'}, {'status': 'lost'}, {'date_from': '2024-13-01'}, {'date_to': 'yesterday'},
+                       {'date_to': '9999-12-31'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+
+class MakeOrderTestCase(TransactionTestCase):
+
+    def test_order_enqueues_notification(self):
+        product = create_notebook(stock=5)
+        cart = create_cart(product, 2, 'buyer')
+        recalc_cart(cart)
+        self.client.force_login(cart.owner.user)
+        response = self.client.post(reverse('make_order'), {
+            'first_name': 'Иван', 'last_name': 'Иванов', 'phone': '1', 'address': '',
+            'buying_type': Order.BUYING_TYPE_SELF, 'order_date': timezone.localdate().isoformat(), 'comment': '',
+        })
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+        order = Order.objects.get()
+        job = Job.objects.get()
+        self.assertEqual((job.name, job.payload), ('notify_order_created', {'order_id': order.id}))
+
+        jobs.autodiscover()
+        with self.assertLogs('mainapp.tasks', 'INFO') as logs:
+            self.assertEqual(jobs.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_DONE)
+        self.assertIn(f'Новый заказ №{order.id}', logs.output[0])
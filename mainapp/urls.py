@@ -2,14 +2,22 @@ from django.urls import path
 from . import views
 
 
-urlpatterns = [
+storefront_urlpatterns = [
     path('', views.BaseView.as_view(), name='base'),
     path('products/<str:ct_model>/<str:slug>/', views.ProductDetailView.as_view(), name='product_detail'),
     path('category/<str:slug>/', views.CategoryDetailView.as_view(), name='category_detail'),
     path('cart/', views.CartView.as_view(), name='cart'),
+    path('cart/summary/', views.CartSummaryView.as_view(), name='cart_summary'),
     path('add-to-cart/<str:ct_model>/<str:slug>/', views.AddToCartView.as_view(), name='add_to_cart'),
     path('remove-from-cart/<str:ct_model>/<str:slug>/', views.DeleteFromCartView.as_view(), name='delete_from_cart'),
     path('change_quantity/<str:ct_model>/<str:slug>/', views.ChangeQuantityView.as_view(), name='change_quantity'),
     path('checkout/', views.CheckoutView.as_view(), name='checkout'),
     path('make-order/', views.MakeOrderView.as_view(), name='make_order'),
 ]
+
+staff_urlpatterns = [
+    path('orders/export/', views.OrderExportView.as_view(), name='export_orders'),
+    path('sales/dashboard/', views.SalesDashboardView.as_view(), name='sales_dashboard'),
+]
+
+urlpatterns = storefront_urlpatterns + staff_urlpatterns
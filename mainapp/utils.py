@@ -1,5 +1,7 @@
 from django.db import models
 
+from .models import Cart
+
 def recalc_cart(cart):
     cart_data = cart.products.aggregate(models.Sum('total_price'), models.Count('id'))
     if cart_data.get('total_price__sum', None):
@@ -7,4 +9,10 @@ def recalc_cart(cart):
     else:
         cart.total_price = 0
     cart.total_products = cart_data['id__count']
-    cart.save()
\ No newline at end of file
+    # Версию увеличиваем в самой БД: при параллельных запросах к одной корзине
+    # прочитанное значение могло устареть, и два изменения получили бы один ETag
+    Cart.objects.filter(pk=cart.pk).update(
+        total_price=cart.total_price, total_products=cart.total_products, in_order=cart.in_order,
+        version=models.F('version') + 1
+    )
+    cart.refresh_from_db(fields=['version'])
@@ -1,15 +1,25 @@
-from django.db import transaction
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.db import models, transaction
 from django.shortcuts import render
 from django.contrib import messages
 from django.contrib.contenttypes.models import ContentType
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from django.utils.dateparse import parse_date
 from django.views.generic import DetailView, View
 
 from .models import Notebook, Smartphone, Category, LatestProducts, Customer,\
-    Cart, CartProduct
-from .mixins import CategoryDetailMixin, CartMixin
+    Cart, CartProduct, Order, DailySales, DailyCategorySales, DailyProductSales, RelatedProduct
+from .mixins import CategoryDetailMixin, CartMixin, StaffRequiredMixin
 from .forms import OrderForm
 from .utils import recalc_cart
+from .jobs import enqueue
+from .inventory import OutOfStock, reserve_cart, release_cart, confirm_cart, cancel_cart, get_available_stock
 
 # Create your views here.
 
@@ -33,7 +43,7 @@ class ProductDetailView(CartMixin, CategoryDetailMixin, DetailView):
 
     def dispatch(self, request, *args, **kwargs):
         self.model = self.CT_MODEL_MODEL_CLASS[kwargs['ct_model']]
-        self.queryset = self.model._base_manager.all()
+        self.queryset = self.model._base_manager.select_related('category')
         return super().dispatch(request, *args, **kwargs)
 
     context_object_name = 'product'
@@ -44,6 +54,9 @@ class ProductDetailView(CartMixin, CategoryDetailMixin, DetailView):
         context = super().get_context_data(**kwargs)
         context['ct_model'] = self.model._meta.model_name
         context['cart'] = self.cart
+        context['related_products'] = RelatedProduct.objects.filter(
+            content_type=ContentType.objects.get_for_model(self.model), object_id=self.object.id
+        ).select_related('related_content_type').order_by('rank')
         return context
 
 
@@ -67,12 +80,16 @@ class AddToCartView(CartMixin, View):
         ct_model, product_slug = kwargs.get('ct_model'), kwargs.get('slug')
         content_type = ContentType.objects.get(model=ct_model)
         product = content_type.model_class().objects.get(slug=product_slug)
+        if get_available_stock(self.cart, product) < 1:
+            messages.add_message(request, messages.INFO, "Товара нет в наличии")
+            return HttpResponseRedirect('/cart/')
         cart_product, created = CartProduct.objects.get_or_create(
             user=self.cart.owner, cart=self.cart, content_type=content_type,
             object_id=product.id
         )
         if created:
             self.cart.products.add(cart_product)
+            release_cart(self.cart)
         recalc_cart(self.cart)
         messages.add_message(request, messages.INFO, "Товар успешно добавлен")
         return HttpResponseRedirect('/cart/')
@@ -90,6 +107,7 @@ class DeleteFromCartView(CartMixin, View):
         )
         self.cart.products.remove(cart_product)
         cart_product.delete()
+        release_cart(self.cart)
         recalc_cart(self.cart)
         messages.add_message(request, messages.INFO, "Товар успешно убран из корзины")
         return HttpResponseRedirect('/cart/')
@@ -105,8 +123,14 @@ class ChangeQuantityView(CartMixin, View):
             user=self.cart.owner, cart=self.cart, content_type=content_type,
             object_id=product.id
         )
-        cart_product.quantity = int(request.POST.get('quantity'))
+        quantity = int(request.POST.get('quantity'))
+        available = get_available_stock(self.cart, product)
+        if quantity > available:
+            messages.add_message(request, messages.INFO, f"Доступно только {available} шт.")
+            return HttpResponseRedirect('/cart/')
+        cart_product.quantity = quantity
         cart_product.save()
+        release_cart(self.cart)
         recalc_cart(self.cart)
         messages.add_message(request, messages.INFO, "Кол-во успешно изменено")
         return HttpResponseRedirect('/cart/')
@@ -123,9 +147,32 @@ class CartView(CartMixin, View):
         return render(request, 'mainapp/cart.html', context)
 
 
+class CartSummaryView(CartMixin, View):
+
+    def get(self, request, *args, **kwargs):
+        etag = quote_etag(f'{self.cart.id}-{self.cart.version}')
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = JsonResponse({
+                'total_products': self.cart.total_products,
+                'total_price': str(self.cart.total_price),
+            })
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
 class CheckoutView(CartMixin, View):
 
     def get(self, request, *args, **kwargs):
+        # Резервируем товар на STOCK_RESERVATION_TTL только для корзины покупателя: анонимная
+        # корзина общая для всех посетителей, и заказ из неё оформить нельзя
+        if not self.cart.for_anonymous_user:
+            try:
+                reserve_cart(self.cart)
+            except OutOfStock as e:
+                messages.add_message(request, messages.INFO, f"Недостаточно товара на складе: {e}")
+                return HttpResponseRedirect('/cart/')
         categories = Category.objects.get_categories_for_sidebar()
         form = OrderForm(request.POST or None)
         context = {
@@ -138,27 +185,146 @@ class CheckoutView(CartMixin, View):
 
 class MakeOrderView(CartMixin, View):
 
-    @transaction.atomic
     def post(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            messages.add_message(request, messages.INFO, "Для оформления заказа войдите в аккаунт")
+            return HttpResponseRedirect('/checkout/')
         form = OrderForm(request.POST or None)
         customer = Customer.objects.get(user=request.user)
         if form.is_valid():
-            new_order = form.save(commit=False)
-            new_order.customer = customer
-            new_order.first_name = form.cleaned_data['first_name']
-            new_order.last_name = form.cleaned_data['last_name']
-            new_order.phone = form.cleaned_data['phone']
-            new_order.address = form.cleaned_data['address']
-            new_order.buying_type = form.cleaned_data['buying_type']
-            new_order.order_date = form.cleaned_data['order_date']
-            new_order.comment = form.cleaned_data['comment']
-            new_order.save()
-            self.cart.in_order = True
-            recalc_cart(self.cart)
-            new_order.cart = self.cart
-            new_order.save()
-            customer.orders.add(new_order)
+            # Остаток списывается своей короткой транзакцией до транзакции заказа, чтобы строки
+            # товаров не оставались заблокированными, пока сохраняются заказ и корзина
+            try:
+                confirm_cart(self.cart)
+            except OutOfStock as e:
+                messages.add_message(request, messages.INFO, f"Недостаточно товара на складе: {e}")
+                return HttpResponseRedirect('/cart/')
+            try:
+                with transaction.atomic():
+                    new_order = form.save(commit=False)
+                    new_order.customer = customer
+                    new_order.first_name = form.cleaned_data['first_name']
+                    new_order.last_name = form.cleaned_data['last_name']
+                    new_order.phone = form.cleaned_data['phone']
+                    new_order.address = form.cleaned_data['address']
+                    new_order.buying_type = form.cleaned_data['buying_type']
+                    new_order.order_date = form.cleaned_data['order_date']
+                    new_order.comment = form.cleaned_data['comment']
+                    new_order.save()
+                    self.cart.in_order = True
+                    recalc_cart(self.cart)
+                    new_order.cart = self.cart
+                    new_order.save()
+                    customer.orders.add(new_order)
+                    enqueue('notify_order_created', order_id=new_order.id)
+            except Exception:
+                cancel_cart(self.cart)
+                raise
             messages.add_message(request, messages.INFO, "Спасибо за заказ!Менеджер с Вами свяжется")
             return HttpResponseRedirect('/')
         messages.add_message(request, messages.INFO, "Не удалось сформировать заказ")
         return HttpResponseRedirect('/checkout/')
+
+
+class Echo:
+
+    def write(self, value):
+        return value
+
+
+class OrderExportView(StaffRequiredMixin, View):
+
+    CHUNK_SIZE = 2000
+    STATUSES = (Order.STATUS_NEW, Order.STATUS_IN_PROGRESS, Order.STATUS_READY, Order.STATUS_COMPLETED)
+    COLUMNS = (
+        'id', 'status', 'buying_type', 'placed_at', 'created_at', 'order_date', 'first_name', 'last_name', 'phone',
+        'address', 'comment', 'customer_id', 'username', 'email', 'cart_id', 'cart_total_products',
+        'cart_total_price',
+    )
+    CONTENT_TYPES = {
+        'csv': 'text/csv; charset=utf-8',
+        'jsonl': 'application/x-ndjson; charset=utf-8',
+    }
+
+    def get(self, request, *args, **kwargs):
+        fmt = request.GET.get('format', 'csv')
+        if fmt not in self.CONTENT_TYPES:
+            return HttpResponseBadRequest('Неизвестный формат выгрузки')
+        orders = Order.objects.select_related('customer__user', 'cart').order_by('pk')
+        status = request.GET.get('status')
+        if status:
+            if status not in self.STATUSES:
+                return HttpResponseBadRequest('Неизвестный статус заказа')
+            orders = orders.filter(status=status)
+        # Границы дня переводим в моменты времени, чтобы фильтр шёл по индексу placed_at
+        for param, lookup, shift in (('date_from', 'placed_at__gte', 0), ('date_to', 'placed_at__lt', 1)):
+            value = request.GET.get(param)
+            if not value:
+                continue
+            try:
+                date = parse_date(value)
+                start = timezone.make_aware(datetime.combine(date + timedelta(days=shift), time.min))
+            except (TypeError, ValueError, OverflowError):
+                # TypeError: parse_date вернул None, OverflowError: дата у границы datetime.max
+                return HttpResponseBadRequest(f'Некорректная дата в параметре {param}')
+            orders = orders.filter(**{lookup: start})
+        rows = (self.get_row(order) for order in orders.iterator(chunk_size=self.CHUNK_SIZE))
+        if fmt == 'csv':
+            writer = csv.writer(Echo())
+            content = (writer.writerow(row) for row in self.with_header(rows))
+        else:
+            content = (json.dumps(dict(zip(self.COLUMNS, row)), ensure_ascii=False, default=str) + '\n' for row in rows)
+        response = StreamingHttpResponse(content, content_type=self.CONTENT_TYPES[fmt])
+        response['Content-Disposition'] = f'attachment; filename="orders.{fmt}"'
+        return response
+
+    def with_header(self, rows):
+        yield self.COLUMNS
+        yield from rows
+
+    @staticmethod
+    def get_row(order):
+        user = order.customer.user
+        cart = order.cart
+        return (
+            order.id, order.status, order.buying_type, order.placed_at.isoformat(), order.created_at.isoformat(),
+            order.order_date.isoformat(),
+            order.first_name, order.last_name, order.phone, order.address, order.comment,
+            order.customer_id, user.username, user.email, order.cart_id,
+            cart.total_products if cart else None, cart.total_price if cart else None,
+        )
+
+
+class SalesDashboardView(StaffRequiredMixin, View):
+
+    PERIODS = (7, 30, 90)
+    TOP_PRODUCTS_COUNT = 10
+
+    def get(self, request, *args, **kwargs):
+        try:
+            days = int(request.GET.get('days', self.PERIODS[0]))
+        except ValueError:
+            days = self.PERIODS[0]
+        if days not in self.PERIODS:
+            days = self.PERIODS[0]
+        since = timezone.localdate() - timedelta(days=days - 1)
+        daily_sales = DailySales.objects.filter(date__gte=since).order_by('-date')
+        category_sales = DailyCategorySales.objects.filter(date__gte=since).select_related('category')\
+            .order_by('-date', 'category__name')
+        top_products = DailyProductSales.objects.filter(date__gte=since)\
+            .values('content_type', 'object_id', 'title')\
+            .annotate(quantity=models.Sum('quantity'), revenue=models.Sum('revenue'))\
+            .order_by('-revenue')[:self.TOP_PRODUCTS_COUNT]
+        totals = daily_sales.aggregate(
+            orders_count=models.Sum('orders_count'), products_count=models.Sum('products_count'),
+            revenue=models.Sum('revenue')
+        )
+        context = {
+            'days': days,
+            'periods': self.PERIODS,
+            'daily_sales': daily_sales,
+            'category_sales': category_sales,
+            'top_products': top_products,
+            'totals': totals,
+        }
+        return render(request, 'mainapp/sales_dashboard.html', context)
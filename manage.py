@@ -3,6 +3,9 @@
 import os
 import sys
 
+# До импорта Django: отключает подмену distutils из setuptools, см. djangoshop/__init__.py
+import djangoshop  # noqa: F401
+
 
 def main():
     """Run administrative tasks."""